@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""Benchmark search-transcripts.py against a synthetic transcript corpus.
+
+Usage:
+  # Generate a default corpus in a temp directory and benchmark it
+  ./scripts/bench-transcripts.py
+
+  # Bigger corpus with heavy tool output, kept for later runs
+  ./scripts/bench-transcripts.py --sessions 400 --entries 600 --tool-result-size 20000 --corpus /tmp/sicp-bench
+
+  # Reuse an existing corpus and save results for comparison
+  ./scripts/bench-transcripts.py --corpus /tmp/sicp-bench --reuse --output before.json
+
+  # Compare against a previous run
+  ./scripts/bench-transcripts.py --corpus /tmp/sicp-bench --reuse --compare before.json
+
+Each scenario runs once with an empty .tutor/cache (cold) and then --repeat
+times with whatever caches the cold run left behind (warm). Wall time and
+peak RSS of every run are recorded, and results are written as JSON.
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+SEARCH_SCRIPT = SCRIPT_DIR / "search-transcripts.py"
+
+WORDS = (
+    "procedure process recursion iteration substitution model evaluate apply "
+    "lambda define cond if else let environment frame binding closure "
+    "higher-order abstraction data pair cons car cdr list map filter "
+    "accumulate stream delay force interpreter compiler register machine "
+    "tail recursive linear exponential logarithmic growth order fib fact "
+    "sqrt-iter good-enough improve average square cube sum-integers"
+).split()
+PHRASES = ["tail recursion", "iterative process", "Exercise 1.11", "Exercise 2.17",
+           "applicative order", "normal order", "fib-iter"]
+SKILL_PROMPT = "You are a patient SICP teaching assistant. " * 400
+
+
+def sentence(rng, words):
+    """Make a sentence of SICP vocabulary, sometimes containing a key phrase."""
+    text = ' '.join(rng.choice(WORDS) for _ in range(words))
+    if rng.random() < 0.1:
+        text += f" {rng.choice(PHRASES)}"
+    return text
+
+
+def tool_output(rng, args):
+    """Make a tool_result payload with a log-normal size distribution."""
+    size = int(min(rng.lognormvariate(0, args.tool_result_spread) * args.tool_result_size,
+                   args.tool_result_max))
+    line = '(define (fib n) (if (< n 2) n (+ (fib (- n 1)) (fib (- n 2)))))  ; "fib"\n'
+    return (line * (size // len(line) + 1))[:size]
+
+
+def make_entry(rng, args, session_id, timestamp, parent):
+    """Make one transcript entry shaped like a Claude Code session line."""
+    entry = {
+        "parentUuid": parent,
+        "isSidechain": False,
+        "userType": "external",
+        "cwd": "/home/student/sicp-tutoring",
+        "sessionId": session_id,
+        "version": "2.1.0",
+        "gitBranch": "main",
+        "uuid": str(uuid.UUID(int=rng.getrandbits(128))),
+        "timestamp": timestamp.isoformat(timespec='milliseconds') + "Z",
+    }
+    roll = rng.random()
+    if roll < args.meta_ratio:
+        entry.update(type="user", isMeta=True,
+                     message={"role": "user", "content": SKILL_PROMPT})
+    elif roll < 0.45:
+        if rng.random() < 0.5:
+            content = sentence(rng, rng.randint(5, 40))
+        else:
+            output = tool_output(rng, args)
+            content = [{"type": "tool_result", "tool_use_id": "toolu_01", "content": output}]
+            entry["toolUseResult"] = {"stdout": output, "stderr": "", "interrupted": False}
+        entry.update(type="user", message={"role": "user", "content": content})
+    elif roll < 0.9:
+        content = [{"type": "text", "text": sentence(rng, rng.randint(10, 120))}]
+        if rng.random() < args.thinking_ratio:
+            content.insert(0, {"type": "thinking", "thinking": sentence(rng, rng.randint(50, 400)),
+                               "signature": "Eq" + "A" * 400})
+        if rng.random() < 0.4:
+            content.append({"type": "tool_use", "id": "toolu_01", "name": "Bash",
+                            "input": {"command": "racket work/ex1-11.rkt"}})
+        entry.update(type="assistant", message={
+            "id": "msg_01", "type": "message", "role": "assistant", "model": "model",
+            "content": content, "stop_reason": "end_turn",
+            "usage": {"input_tokens": 1200, "output_tokens": 300},
+        })
+    else:
+        entry.update(type="system", subtype="local_command", content=sentence(rng, 6))
+    return entry
+
+
+def generate_corpus(root, args):
+    """Write a synthetic .tutor/transcripts directory under root."""
+    rng = random.Random(args.seed)
+    transcripts = root / ".tutor/transcripts"
+    transcripts.mkdir(parents=True, exist_ok=True)
+    today = datetime.now().replace(hour=10, minute=0, second=0, microsecond=0)
+
+    for session in range(args.sessions):
+        start = today - timedelta(days=session * args.days_between)
+        session_id = str(uuid.UUID(int=rng.getrandbits(128)))
+        filepath = transcripts / f"{start:%Y-%m-%d}-{session_id}.jsonl"
+        entries = max(1, int(rng.gauss(args.entries, args.entries / 4)))
+        parent = None
+        with open(filepath, 'w') as f:
+            for i in range(entries):
+                entry = make_entry(rng, args, session_id, start + timedelta(seconds=20 * i), parent)
+                parent = entry["uuid"]
+                f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+
+
+def scenarios(root):
+    """Return (name, argv) pairs covering the main search-transcripts modes."""
+    files = sorted((root / ".tutor/transcripts").glob("*.jsonl"), key=lambda p: p.stat().st_size)
+    largest = files[-1].relative_to(root) if files else None
+    lines = sum(1 for _ in open(root / largest, 'rb')) if largest else 0
+    middle = max(1, lines // 2)
+
+    runs = [
+        ("grep", ["--grep", "tail recursion", "--text-only", "--context", "0"]),
+        ("grep-context", ["--grep", "tail recursion", "--text-only", "--context", "2"]),
+        ("grep-scan", ["--grep", "tail recursion", "--text-only", "--no-index", "--context", "2"]),
+        ("grep-raw", ["--grep", "fib-iter", "--context", "0"]),
+        ("grep-regex", ["--grep", r"Exercise [12]\.1[17]", "--text-only", "--limit", "100"]),
+        ("grep-since", ["--grep", "recursion", "--since", "7d", "--text-only", "--limit", "100"]),
+        ("list", ["--list"]),
+    ]
+    if largest:
+        runs.append(("file-lines", ["--file", str(largest), "--lines",
+                                    f"{middle}-{middle + 50}", "--text-only"]))
+        runs.append(("file-head", ["--file", str(largest), "--text-only"]))
+    return runs
+
+
+def run_once(root, argv):
+    """Run search-transcripts.py once, returning (wall seconds, peak RSS in KB)."""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, str(SEARCH_SCRIPT)] + argv, cwd=root,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    _, status, usage = os.wait4(proc.pid, 0)
+    wall = time.perf_counter() - start
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    stderr = proc.stderr.read().decode(errors='replace')
+    proc.stderr.close()
+    if proc.returncode != 0:
+        raise RuntimeError(f"search-transcripts.py {' '.join(argv)} failed:\n{stderr}")
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    max_rss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+    return wall, max_rss
+
+
+def benchmark(root, args):
+    """Run every scenario cold then warm, returning result records."""
+    results = []
+    for name, argv in scenarios(root):
+        if args.only and name not in args.only:
+            continue
+        shutil.rmtree(root / ".tutor/cache", ignore_errors=True)
+        cold_wall, cold_rss = run_once(root, argv)
+        warm = [run_once(root, argv) for _ in range(args.repeat)]
+        walls = [wall for wall, _ in warm]
+        results.append({
+            "name": name,
+            "argv": argv,
+            "cold_wall_s": round(cold_wall, 4),
+            "cold_max_rss_kb": cold_rss,
+            "warm_median_wall_s": round(statistics.median(walls), 4),
+            "warm_min_wall_s": round(min(walls), 4),
+            "warm_max_rss_kb": max(rss for _, rss in warm),
+        })
+        print(f"  {name}: cold {cold_wall:.3f}s, warm {statistics.median(walls):.3f}s, "
+              f"{max(cold_rss, results[-1]['warm_max_rss_kb']) // 1024} MB", file=sys.stderr)
+    return results
+
+
+def corpus_stats(root):
+    """Summarize the corpus size so results can be compared like for like."""
+    files = list((root / ".tutor/transcripts").glob("*.jsonl"))
+    return {"sessions": len(files), "bytes": sum(f.stat().st_size for f in files)}
+
+
+def compare(results, baseline_path):
+    """Print warm-time ratios against a previous results file on stderr."""
+    with open(baseline_path) as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+    print(f"\nCompared with {baseline_path} (warm median, cold):", file=sys.stderr)
+    for result in results:
+        before = baseline.get(result["name"])
+        if not before:
+            continue
+        warm = result["warm_median_wall_s"] / max(before["warm_median_wall_s"], 1e-9)
+        cold = result["cold_wall_s"] / max(before["cold_wall_s"], 1e-9)
+        print(f"  {result['name']:14} {warm:6.2f}x {cold:6.2f}x", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark search-transcripts.py on a synthetic corpus"
+    )
+
+    # Corpus shape
+    parser.add_argument('--sessions', type=int, default=100,
+                        help="Number of session transcripts (default: 100)")
+    parser.add_argument('--entries', type=int, default=300,
+                        help="Mean entries per session (default: 300)")
+    parser.add_argument('--tool-result-size', type=int, default=4000, metavar='BYTES',
+                        help="Median tool_result size in bytes (default: 4000)")
+    parser.add_argument('--tool-result-spread', type=float, default=1.5, metavar='SIGMA',
+                        help="Log-normal sigma of tool_result sizes (default: 1.5)")
+    parser.add_argument('--tool-result-max', type=int, default=5_000_000, metavar='BYTES',
+                        help="Largest tool_result in bytes (default: 5000000)")
+    parser.add_argument('--thinking-ratio', type=float, default=0.3,
+                        help="Fraction of assistant entries with thinking (default: 0.3)")
+    parser.add_argument('--meta-ratio', type=float, default=0.05,
+                        help="Fraction of entries that are meta/skill prompts (default: 0.05)")
+    parser.add_argument('--days-between', type=float, default=1.0,
+                        help="Days between sessions, for --since (default: 1)")
+    parser.add_argument('--seed', type=int, default=1,
+                        help="Random seed (default: 1)")
+
+    # Corpus location
+    parser.add_argument('--corpus', metavar='DIR',
+                        help="Generate the corpus here and keep it (default: a temp dir)")
+    parser.add_argument('--reuse', action='store_true',
+                        help="Benchmark the existing corpus in --corpus instead of generating")
+
+    # Runs and results
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="Warm runs per scenario (default: 3)")
+    parser.add_argument('--only', action='append', metavar='NAME',
+                        help="Run only the named scenario (repeatable)")
+    parser.add_argument('--output', metavar='PATH',
+                        help="Write JSON results here (default: stdout)")
+    parser.add_argument('--compare', metavar='PATH',
+                        help="Compare against a previous JSON results file")
+
+    args = parser.parse_args()
+
+    if args.reuse and not args.corpus:
+        parser.error("--reuse requires --corpus")
+
+    root = Path(args.corpus) if args.corpus else Path(tempfile.mkdtemp(prefix="sicp-bench-"))
+    try:
+        if not args.reuse:
+            shutil.rmtree(root / ".tutor", ignore_errors=True)
+            print(f"Generating {args.sessions} sessions in {root}...", file=sys.stderr)
+            generate_corpus(root, args)
+
+        print("Benchmarking...", file=sys.stderr)
+        results = benchmark(root, args)
+        report = {
+            "created": datetime.now().isoformat(timespec='seconds'),
+            "python": sys.version.split()[0],
+            "corpus": corpus_stats(root),
+            "config": {key: value for key, value in vars(args).items()
+                       if key not in ('output', 'compare', 'only', 'corpus', 'reuse')},
+            "results": results,
+        }
+    finally:
+        if not args.corpus:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
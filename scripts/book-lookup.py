@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""Look up where exercises, sections, figures and problem sets live in the book.
+
+Usage:
+  # Where is Exercise 1.11? (book text, and any code for it)
+  ./scripts/book-lookup.py exercise 1.11
+
+  # Print section 1.2.3's text, code and the problem sets that cover it
+  ./scripts/book-lookup.py --show section 1.2.3
+
+  # A bare number looks up every kind: exercise, section and figure 3.1
+  ./scripts/book-lookup.py 3.1
+
+  # Problem sets by directory, number or title
+  ./scripts/book-lookup.py pset ps3
+  ./scripts/book-lookup.py pset rsa encryption
+
+  # List the keys of one kind
+  ./scripts/book-lookup.py --list figure
+
+  # Bring the index up to date (setup does this as its last phase)
+  ./scripts/book-lookup.py --build
+
+Each lookup prints key, path, start byte and end byte, tab-separated, one
+location per line. Answers come from book/lookup.json, a map from keys to
+byte ranges and nothing else, so a lookup never reads the book itself. The
+index is built from the processed book (book/text/*.md), the book's code
+(book/code/*.scm.html) and the problem set readmes
+(book/psets/*/readme.html). book/lookup-files.json records each file's
+size, mtime and entries, so --build re-reads only the files that changed.
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_DIR = SCRIPT_DIR.parent
+INDEX_PATH = PROJECT_DIR / "book/lookup.json"
+# What --build extracted from each file, kept apart so lookups don't load it
+FILES_PATH = PROJECT_DIR / "book/lookup-files.json"
+INDEX_VERSION = 2
+
+# Globs of the indexed files, in the order their locations are listed
+SOURCES = ("book/text/*.md", "book/code/*.scm.html", "book/psets/*/readme.html")
+
+KINDS = {"exercise": "exercise", "ex": "exercise", "section": "section", "sec": "section",
+         "chapter": "chapter", "ch": "chapter", "figure": "figure", "fig": "figure",
+         "pset": "pset", "ps": "pset"}
+
+# Book chapters are named by section with dots escaped, e.g. 1_002e2_002e3.md
+SECTION_FILE = re.compile(r'(\d+(?:_002e\d+)*)')
+CHAPTER_FILE = re.compile(r'Chapter-(\d+)')
+# Exercise and figure openings in pandoc's markdown: the anchor, or the bold label
+TEXT_MARKER = re.compile(rb'\{#(Exercise|Figure)-(\d+(?:_002e\d+)+)[\s}]'
+                         rb'|\*\*(Exercise|Figure) (\d+(?:\.\d+)+):')
+FIGURE_CAPTION = re.compile(rb'Figure \d+(?:\.\d+)+:')
+FENCE_OPEN = re.compile(rb':::+ *\S')
+FENCE_CLOSE = re.compile(rb':::+\s*$')
+# Comment headers in the book's code, e.g. ";;;SECTION 1.1.4" and ";; EXERCISE 1.11"
+CODE_MARKER = re.compile(rb'^;+ ?(SECTION|EXERCISE) (\d+(?:\.\d+)*)', re.M)
+PSET_TITLE = re.compile(rb'<title>(.*?)</title>', re.I | re.S)
+PSET_SECTIONS = re.compile(rb'Relevant sections? in text:([^<]*)', re.I)
+
+
+def make_key(kind, name):
+    """Normalize a kind and name into an index key, e.g. "exercise 1.11"."""
+    return " ".join(f"{kind} {name}".lower().split())
+
+
+def text_entries(path, data):
+    """Locate a processed chapter's section, and the exercises and figures in it.
+
+    An exercise runs to the next exercise, figure or heading, or to the end
+    of the fenced div it sits in; a figure also ends with its caption's
+    paragraph.
+    """
+    entries = []
+    if m := SECTION_FILE.fullmatch(path.stem):
+        entries.append([make_key("section", m.group(1).replace("_002e", ".")), 0, len(data)])
+    elif m := CHAPTER_FILE.fullmatch(path.stem):
+        entries.append([make_key("chapter", m.group(1)), 0, len(data)])
+
+    block = None  # [key, start, is_figure, caption_seen]
+    depth = 0     # fenced divs opened inside the current block
+    offset = 0
+    for line in data.splitlines(keepends=True):
+        key = None
+        if marker := TEXT_MARKER.search(line):
+            kind = (marker.group(1) or marker.group(3)).decode().lower()
+            number = (marker.group(2) or marker.group(4)).decode().replace("_002e", ".")
+            key = make_key(kind, number)
+            if block and block[0] == key:
+                # A figure's anchor and its caption's label open the same block
+                marker = None
+        if block:
+            ends = (marker or line.startswith(b"#")
+                    or (FENCE_CLOSE.match(line) and depth == 0)
+                    or (block[2] and block[3] and not line.strip()))
+            if ends:
+                entries.append([block[0], block[1], offset])
+                block = None
+            elif FENCE_CLOSE.match(line):
+                depth -= 1
+            elif FENCE_OPEN.match(line):
+                depth += 1
+        if marker:
+            block = [key, offset, kind == "figure", False]
+            depth = 0
+        if block and block[2] and FIGURE_CAPTION.search(line):
+            block[3] = True
+        offset += len(line)
+    if block:
+        entries.append([block[0], block[1], len(data)])
+    return entries
+
+
+def code_entries(data):
+    """Locate the sections and exercises marked in one of the book's code files.
+
+    A section runs to the next section marker, an exercise to the next marker.
+    """
+    markers = [(m.group(1).decode().lower(), m.group(2).decode(), m.start())
+               for m in CODE_MARKER.finditer(data)]
+    entries = []
+    for i, (kind, number, start) in enumerate(markers):
+        end = next((later for other, _, later in markers[i + 1:]
+                    if kind == "exercise" or other == "section"), len(data))
+        entries.append([make_key(kind, number), start, end])
+    return entries
+
+
+def pset_entries(path, data):
+    """Locate a problem set's readme by its directory and title, and the sections it covers."""
+    whole = [0, len(data)]
+    name = path.parent.name
+    entries = [[make_key("pset", name), *whole]]
+    if m := PSET_TITLE.search(data):
+        title = m.group(1).decode(errors="replace")
+        if title.strip():
+            entries.append([make_key("pset", title), *whole])
+    if m := PSET_SECTIONS.search(data):
+        for section in re.findall(rb'\d+(?:\.\d+)*', m.group(1)):
+            entries.append([make_key("section", section.decode()), *whole])
+    return entries
+
+
+def file_entries(relative, path):
+    """Extract the index entries for one source file."""
+    data = path.read_bytes()
+    if relative.startswith("book/text/"):
+        return text_entries(path, data)
+    if relative.startswith("book/code/"):
+        return code_entries(data)
+    return pset_entries(path, data)
+
+
+def load_json(path):
+    """Load one of the index's files, or None if there is none or it's from another version."""
+    try:
+        value = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+    if not isinstance(value, dict) or value.get("version") != INDEX_VERSION:
+        return None
+    return value
+
+
+def write_json(path, value):
+    """Write one of the index's files through a temporary file renamed into place."""
+    temp = path.with_name(f".{path.name}.tmp")
+    temp.write_text(json.dumps({"version": INDEX_VERSION, **value}, separators=(",", ":")) + "\n")
+    os.replace(temp, path)
+
+
+def build_index():
+    """Bring the lookup index up to date, re-reading only the files that changed."""
+    previous = (load_json(FILES_PATH) or {}).get("files", {})
+    files = {}
+    reread = 0
+    for pattern in SOURCES:
+        for path in sorted(PROJECT_DIR.glob(pattern)):
+            relative = str(path.relative_to(PROJECT_DIR))
+            stat = path.stat()
+            identity = [stat.st_size, stat.st_mtime_ns]
+            recorded = previous.get(relative)
+            if recorded and recorded["identity"] == identity:
+                files[relative] = recorded
+                continue
+            files[relative] = {"identity": identity, "entries": file_entries(relative, path)}
+            reread += 1
+
+    keys = {}
+    for relative, record in files.items():
+        for key, start, end in record["entries"]:
+            keys.setdefault(key, []).append([relative, start, end])
+
+    write_json(INDEX_PATH, {"keys": keys})
+    write_json(FILES_PATH, {"files": files})
+    print(f"Indexed {len(files)} files ({reread} re-read), {len(keys)} keys")
+
+
+def query_keys(words):
+    """Turn query words into the keys to look up.
+
+    "exercise 1.11" and "ex 1.11" name one key; "pset 3" means ps3; a bare
+    number looks up the exercise, section and figure with that number.
+    """
+    kind = KINDS.get(words[0].lower())
+    if kind is None:
+        name = " ".join(words)
+        return [make_key(kind, name) for kind in ("exercise", "section", "chapter", "figure")]
+    name = " ".join(words[1:])
+    if kind == "pset" and name.isdigit():
+        name = f"ps{name}"
+    return [make_key(kind, name)]
+
+
+def numbered(key):
+    """Sort key for index keys that orders their numbers numerically, e.g. 1.9 before 1.10."""
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', key)]
+
+
+def show(path, start, end):
+    """Print one located range of a file."""
+    with open(PROJECT_DIR / path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    print(f"==> {path} (bytes {start}-{end}) <==")
+    print(data.decode(errors="replace").rstrip("\n"))
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Look up exercises, sections, figures and problem sets in the book"
+    )
+    parser.add_argument('query', nargs='*',
+                        help="What to look up, e.g. 'exercise 1.11', 'section 1.2', 'figure 3.1', 'pset ps3'")
+    parser.add_argument('--show', action='store_true',
+                        help="Print the text of each location instead of its byte range")
+    parser.add_argument('--list', metavar='KIND', choices=sorted(set(KINDS.values())),
+                        help="List the indexed keys of one kind")
+    parser.add_argument('--build', action='store_true',
+                        help="Bring the index up to date with the book, code and problem sets")
+    args = parser.parse_args()
+
+    if args.build:
+        build_index()
+        if not args.query and not args.list:
+            return
+    elif not args.query and not args.list:
+        parser.error("nothing to look up")
+
+    index = load_json(INDEX_PATH)
+    if index is None:
+        print("No book index; run ./scripts/setup.sh or ./scripts/book-lookup.py --build",
+              file=sys.stderr)
+        sys.exit(1)
+    keys = index["keys"]
+
+    if args.list:
+        prefix = f"{args.list} "
+        for key in sorted((k for k in keys if k.startswith(prefix)), key=numbered):
+            print(key)
+        return
+
+    found = [(key, keys[key]) for key in query_keys(args.query) if key in keys]
+    if not found:
+        print(f"No entry for {' '.join(args.query)}", file=sys.stderr)
+        sys.exit(1)
+    for key, locations in found:
+        for path, start, end in locations:
+            if args.show:
+                show(path, start, end)
+            else:
+                print(f"{key}\t{path}\t{start}\t{end}")
+
+
+if __name__ == "__main__":
+    main()
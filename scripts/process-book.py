@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Convert the SICP book's XHTML chapters to markdown for the tutor.
+
+Usage:
+  # Convert the chapters that changed since the last run
+  ./scripts/process-book.py
+
+  # Convert every chapter again, four at a time
+  ./scripts/process-book.py --force --jobs 4
+
+Chapters in book/sicp-source/html/ are converted into book/text/ by pandoc
+processes running side by side. book/text/.manifest.json records a hash of
+each chapter's source and output, so a chapter is converted again only when
+its source or output changed (or pandoc or its options did), and a run that
+was interrupted picks up where it stopped. Each output is written to a
+temporary file and renamed into place, so the tutor never reads a partial
+chapter. The term, exercise and figure indices are extracted alongside as
+TSV files.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent.resolve()
+PROJECT_DIR = SCRIPT_DIR.parent
+SOURCE_DIR = PROJECT_DIR / "book/sicp-source/html"
+TEXT_DIR = PROJECT_DIR / "book/text"
+MANIFEST_PATH = TEXT_DIR / ".manifest.json"
+MANIFEST_VERSION = 1
+
+# Navigation and index pages, not useful for tutoring as text
+SKIP_FILES = {"Term-Index", "Figures", "Exercises", "index"}
+PANDOC_OPTIONS = ["--from=html", "--to=markdown", "--wrap=none", "--strip-comments"]
+
+# Term-Index rows: term<TAB>section
+TERM_ROW = re.compile(r'.*<td[^>]*><a[^>]*>([^<]*)</a>:</td>.*<td[^>]*><a[^>]*>([^<]*)</a>.*')
+# Exercises and Figures links: number<TAB>chapter file
+INDEX_LINK = '<a href="([^"\n]+)#{kind}[^"\n]*">([0-9.]+)</a>'
+
+
+def file_hash(path):
+    """Return the SHA-256 of a file's contents, or None if it's missing."""
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+def write_atomic(path, text):
+    """Write text to path through a temporary file renamed into place."""
+    temp = path.with_name(f".{path.name}.tmp")
+    temp.write_text(text)
+    os.replace(temp, path)
+
+
+def pandoc_version():
+    """Return pandoc's version line, e.g. "pandoc 3.1.9"."""
+    result = subprocess.run(["pandoc", "--version"], capture_output=True, text=True, check=True)
+    return result.stdout.splitlines()[0].strip()
+
+
+def load_manifest(pandoc):
+    """Load the chapter manifest, starting afresh if pandoc or its options changed."""
+    try:
+        manifest = json.loads(MANIFEST_PATH.read_text())
+    except (OSError, ValueError):
+        manifest = None
+    if (not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("pandoc") != pandoc or manifest.get("options") != PANDOC_OPTIONS):
+        manifest = {"version": MANIFEST_VERSION, "pandoc": pandoc, "options": PANDOC_OPTIONS,
+                    "chapters": {}}
+    return manifest
+
+
+def save_manifest(manifest):
+    """Record the manifest, after each chapter so an interrupted run can resume."""
+    write_atomic(MANIFEST_PATH, json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+
+
+def convert(name):
+    """Convert one chapter with pandoc into place, returning the output's hash."""
+    output = TEXT_DIR / f"{name}.md"
+    temp = output.with_name(f".{output.name}.tmp")
+    try:
+        subprocess.run(["pandoc", str(SOURCE_DIR / f"{name}.xhtml"), *PANDOC_OPTIONS,
+                        "-o", str(temp)],
+                       capture_output=True, text=True, check=True)
+        digest = file_hash(temp)
+        os.replace(temp, output)
+    finally:
+        temp.unlink(missing_ok=True)
+    return digest
+
+
+def stale_chapters(manifest, force):
+    """Return {name: source hash} for the chapters that need converting.
+
+    Chapters whose source has gone are dropped from the manifest and
+    book/text/ along the way.
+    """
+    chapters = manifest["chapters"]
+    sources = {path.stem: path for path in SOURCE_DIR.glob("*.xhtml")
+               if path.stem not in SKIP_FILES}
+    for name in set(chapters) - set(sources):
+        (TEXT_DIR / f"{name}.md").unlink(missing_ok=True)
+        del chapters[name]
+
+    stale = {}
+    for name, path in sorted(sources.items()):
+        source = file_hash(path)
+        recorded = chapters.get(name)
+        if (force or recorded is None or recorded["source"] != source
+                or recorded["output"] != file_hash(TEXT_DIR / f"{name}.md")):
+            stale[name] = source
+    return stale
+
+
+def extract_indices():
+    """Write term-index.tsv, exercises.tsv and figures.tsv from the book's index pages."""
+    with open(SOURCE_DIR / "Term-Index.xhtml") as f:
+        terms = [f"{m.group(1)}\t{m.group(2)}\n"
+                 for m in map(TERM_ROW.match, f.read().splitlines()) if m]
+    write_atomic(TEXT_DIR / "term-index.tsv", "".join(terms))
+    print(f"    term-index.tsv: {len(terms)} entries")
+
+    for kind, name in (("Exercise", "exercises.tsv"), ("Figure", "figures.tsv")):
+        link = re.compile(INDEX_LINK.format(kind=kind))
+        with open(SOURCE_DIR / f"{kind}s.xhtml") as f:
+            rows = [f"{m.group(2)}\t{m.group(1).split('#')[0].removesuffix('.xhtml')}\n"
+                    for m in link.finditer(f.read())]
+        write_atomic(TEXT_DIR / name, "".join(rows))
+        print(f"    {name}: {len(rows)} entries")
+
+
+def process_book(jobs, force):
+    """Convert the stale chapters on a pool of pandoc processes, then extract the indices.
+
+    Returns the number of chapters that failed to convert.
+    """
+    TEXT_DIR.mkdir(parents=True, exist_ok=True)
+    for temp in TEXT_DIR.glob(".*.tmp"):
+        temp.unlink()
+
+    manifest = load_manifest(pandoc_version())
+    stale = stale_chapters(manifest, force)
+    current = len(manifest["chapters"]) - len(set(stale) & set(manifest["chapters"]))
+
+    failed = 0
+    # Threads only wait on pandoc, so the conversions themselves run in parallel
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    futures = {pool.submit(convert, name): name for name in stale}
+    try:
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                output = future.result()
+            except subprocess.CalledProcessError as e:
+                failed += 1
+                manifest["chapters"].pop(name, None)
+                print(f"  Failed {name}: {e.stderr.strip()}", file=sys.stderr)
+                continue
+            manifest["chapters"][name] = {"source": stale[name], "output": output}
+            save_manifest(manifest)
+            print(f"  Converted {name}")
+    except KeyboardInterrupt:
+        # Finished chapters are already in the manifest; the rest wait for the next run
+        pool.shutdown(wait=False, cancel_futures=True)
+        print("Interrupted; re-run to convert the remaining chapters", file=sys.stderr)
+        sys.exit(130)
+    pool.shutdown()
+    save_manifest(manifest)
+
+    print(f"Processed {len(manifest['chapters'])} markdown files "
+          f"({len(stale) - failed} converted, {current} up to date)")
+    print("  Extracting indices...")
+    extract_indices()
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the SICP book's XHTML chapters to markdown"
+    )
+    parser.add_argument('--force', action='store_true',
+                        help="Convert every chapter, even those that are up to date")
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                        help="Run up to N pandoc conversions at once (default: one per CPU)")
+    args = parser.parse_args()
+
+    if not SOURCE_DIR.is_dir():
+        print(f"No book sources in {SOURCE_DIR}; initialize the submodule first", file=sys.stderr)
+        sys.exit(1)
+
+    failed = process_book(max(args.jobs, 1), args.force)
+    if failed:
+        print(f"Chapters that failed to convert: {failed}; re-run to retry them", file=sys.stderr)
+        sys.exit(1)
+    print("Done")
+
+
+if __name__ == "__main__":
+    main()
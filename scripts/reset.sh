@@ -5,7 +5,7 @@
 # This script:
 # - Archives current TA context to a named branch in .tutor/
 # - Resets .tutor/ knowledge files to initial placeholders
-# - Removes derived book content (text/)
+# - Removes derived book content (text/, lookup index)
 # - Removes setup markers
 # - PRESERVES student work in work/
 # - PRESERVES book/code/ and book/psets/ (tracked in version control)
@@ -28,7 +28,7 @@ echo ""
 echo "This will:"
 echo "  • Archive .tutor/ state to branch: $ARCHIVE_NAME"
 echo "  • Reset all TA knowledge to initial state"
-echo "  • Remove cached book content (text/)"
+echo "  • Remove cached book content (text/, lookup index)"
 echo "  • Remove setup markers"
 echo ""
 echo "This will NOT touch:"
@@ -165,7 +165,7 @@ if [[ -d .tutor/.git ]]; then
 fi
 
 # =============================================================================
-# Phase 3: Remove derived book content (text/ only)
+# Phase 3: Remove derived book content (text/ and the lookup index)
 # =============================================================================
 
 echo ""
@@ -176,6 +176,11 @@ if [[ -d book/text ]]; then
     echo "    Removed book/text/"
 fi
 
+if [[ -f book/lookup.json ]]; then
+    rm -f book/lookup.json book/lookup-files.json
+    echo "    Removed book/lookup.json"
+fi
+
 # Keep book/code/ and book/psets/ (now tracked in version control)
 echo "    Preserved book/code/ and book/psets/"
 # Keep book/sicp-source/ (the submodule)
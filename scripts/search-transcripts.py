@@ -16,32 +16,174 @@ Usage:
 
   # Read from offset with default limit
   ./scripts/search-transcripts.py --file .tutor/transcripts/2026-01-30-abc.jsonl --offset 100 --text-only
+
+  # One JSON record per result, then read on from a record's byte offset
+  ./scripts/search-transcripts.py --grep "recursion" --text-only --format ndjson
+  ./scripts/search-transcripts.py --file .tutor/transcripts/2026-01-30-abc.jsonl --from-offset 48213 --text-only
+
+  # Keep printing entries as a live session appends them (Ctrl-C to stop)
+  ./scripts/search-transcripts.py --file .tutor/transcripts/2026-01-30-abc.jsonl --text-only --follow
+  ./scripts/search-transcripts.py --grep "Exercise" --text-only --follow
+
+  # Entries mentioning both phrases, or sessions that mention both somewhere
+  ./scripts/search-transcripts.py --grep "tail recursion" --and "iterative process" --text-only
+  ./scripts/search-transcripts.py --grep "tail recursion" --and "iterative process" --scope session
+
+  # Any of a list of patterns, one per line, excluding entries that match another
+  ./scripts/search-transcripts.py --grep-file exercises.txt --not "Exercise 1\.1[0-9]" --text-only
+
+  # Match one field of each entry: thinking blocks, tool calls and results, roles
+  ./scripts/search-transcripts.py --grep "thinking:tail call" --text-only
+  ./scripts/search-transcripts.py --grep "tool_result:command not found" --since 7d
+  ./scripts/search-transcripts.py --grep "role:user" --and "text:fib-iter" --text-only
+
+  # Only what was said between two times (durations ago, or local dates/times)
+  ./scripts/search-transcripts.py --grep "recursion" --since 2026-03-01T14:00 --until 3h --text-only
+
+  # Most relevant passages first (BM25), rather than newest first
+  ./scripts/search-transcripts.py --grep "tail recursion" --rank --text-only
+
+  # Past questions worded like this one, even without the same exact words
+  ./scripts/search-transcripts.py --similar "why does my fib-iter run forever?"
+
+  # Keep a warm query server running; later invocations are answered by it
+  ./scripts/search-transcripts.py --serve &
+
+  # Compress sessions older than 30 days into block archives (read transparently)
+  ./scripts/search-transcripts.py --archive 30d
+
+  # Move repeated skill prompts out of idle transcripts into .tutor/blobs/
+  ./scripts/search-transcripts.py --compact
+
+  # Report where a slow search spends its time (on stderr)
+  ./scripts/search-transcripts.py --grep "recursion" --text-only --stats --profile search.prof
+
+Text-only searches are answered from an incrementally updated SQLite full-text
+index in .tutor/cache/ whenever the pattern contains a literal the index can
+look up; other searches, and those with field-scoped patterns, scan the
+transcripts directly, decoding only the fields a scoped pattern names. While
+--serve is running, invocations from the same directory are forwarded to it
+over a Unix socket and text-only searches are answered from its in-memory
+TranscriptStore; without a server everything runs in-process as before.
 """
 
 import argparse
+import bisect
+import cProfile
+import hashlib
+import heapq
+import io
 import json
+import math
 import os
 import re
+import signal
+import socket
+import socketserver
+import sqlite3
+import struct
 import sys
+import threading
+import time
+import traceback
+import zlib
+from array import array
+from collections import Counter, deque
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
 from datetime import datetime, timedelta
+from functools import lru_cache, partial
+from itertools import islice
 from pathlib import Path
 
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
 TRANSCRIPT_DIR = Path(".tutor/transcripts")
+BLOB_DIR = Path(".tutor/blobs")
+CACHE_DIR = Path(".tutor/cache")
+INDEX_PATH = CACHE_DIR / "transcripts.sqlite3"
+INDEX_VERSION = 2
+TAIL_CHECKSUM_BYTES = 4096
+OFFSETS_VERSION = 2
+TIMES_VERSION = 2
+SIMILAR_VERSION = 2
+# Whole sessions are kept or skipped for --since/--until from their filename
+# date (which may be local) and mtime (which may trail clock skew) only when
+# they clear the bound by this much; closer ones consult their time index.
+TIME_SLACK = timedelta(days=1)
+SESSION_DATE = re.compile(r'\d{4}-\d\d-\d\d')
+# Archived sessions are gzip files made of independently compressed members
+# of whole lines, after an empty first member whose header carries the block
+# index, so zcat still reads them.
+ARCHIVE_SUFFIX = ".jsonl.gz"
+ARCHIVE_BLOCK_BYTES = 256 * 1024
+ARCHIVE_INDEX_ID = b'SI'
+ARCHIVE_INDEX_VERSION = 1
+# --compact moves the content of meta messages at least this large into the
+# blob store, in transcripts nobody has written to for COMPACT_IDLE_SECONDS.
+COMPACT_MIN_BYTES = 1024
+COMPACT_IDLE_SECONDS = 3600
+BLOB_REFERENCE = b'{"$blob":'
+MANIFEST_VERSION = 1
+SERVER_SOCKET = CACHE_DIR / "search.sock"
+SERVER_WATCH_SECONDS = 2.0
+FOLLOW_POLL_SECONDS = 0.5
+# Lines shorter than this are cheaper to hand to json.loads whole than to
+# scan selectively for their text fields; values that take more than
+# SELECTIVE_SCAN_STEPS searches to step over send the line to json.loads too.
+SELECTIVE_DECODE_BYTES = 4096
+SELECTIVE_SCAN_STEPS = 4096
+JSON_WS = re.compile(rb'[ \t\r\n]*')
+JSON_STRING_CLOSE = re.compile(rb'"[ \t\r\n]*[,:}\]]')
+JSON_SCALAR_END = re.compile(rb'[,}\]\s]')
+JSON_STRUCTURE = re.compile(rb'["{}\[\]]')
+# Content item members the selective decoder keeps, by content item type
+TEXT_ITEMS = {'text': 'text'}
+THINKING_ITEMS = {'text': 'text', 'thinking': 'thinking'}
+# Fields a pattern can be scoped to with a "field:" prefix, and the content
+# item type and member each is read from; role and tool match whole names.
+QUERY_FIELDS = {
+    'role': None,
+    'text': ('text', 'text'),
+    'meta': ('text', 'text'),
+    'thinking': ('thinking', 'thinking'),
+    'tool': ('tool_use', 'name'),
+    'tool_result': ('tool_result', 'content'),
+}
+NAME_FIELDS = {'role', 'tool'}
+FIELD_TERM = re.compile(r'(role|text|meta|thinking|tool_result|tool):(.*)', re.DOTALL)
 DEFAULT_LIMIT = 50
 DEFAULT_SEARCH_LIMIT = 20
 DEFAULT_CONTEXT = 1
+NDJSON_BUFFER_BYTES = 64 * 1024
+# The path and line number that prefix a formatted search result
+FORMATTED_PREFIX = re.compile(r'(.*?\.jsonl(?:\.gz)?):(\d+): ', re.DOTALL)
+# Words for --rank: runs of word characters, keeping SICP names like
+# fib-iter and exercise numbers like 1.11 whole. BM25 parameters are the
+# usual defaults.
+RANK_TOKEN = re.compile(r'\w+(?:[-.]\w+)*')
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Work counters and per-phase wall times, reported by --stats
+STATS = Counter()
+PHASES = Counter()
 
 
 def parse_duration(duration_str):
-    """Parse duration like '7d', '2w', '1m' into timedelta."""
-    match = re.match(r'^(\d+)([dwm])$', duration_str)
+    """Parse duration like '3h', '7d', '2w', '1m' into timedelta."""
+    match = re.match(r'^(\d+)([hdwm])$', duration_str)
     if not match:
         raise ValueError(f"Invalid duration: {duration_str}")
 
     num = int(match.group(1))
     unit = match.group(2)
 
-    if unit == 'd':
+    if unit == 'h':
+        return timedelta(hours=num)
+    elif unit == 'd':
         return timedelta(days=num)
     elif unit == 'w':
         return timedelta(weeks=num)
@@ -49,6 +191,50 @@ def parse_duration(duration_str):
         return timedelta(days=num * 30)
 
 
+def parse_time(time_str):
+    """Parse a duration ago ('3h', '7d') or an ISO date/time into an aware datetime.
+
+    Dates and times without a UTC offset are local.
+    """
+    if re.match(r'^\d+[hdwm]$', time_str):
+        return datetime.now().astimezone() - parse_duration(time_str)
+    try:
+        moment = datetime.fromisoformat(time_str.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid time: {time_str} (use e.g. 3h, 7d, 2026-03-01 or "
+                         f"2026-03-01T14:30)") from None
+    return moment.astimezone()
+
+
+def timestamp_ms(timestamp):
+    """Convert an entry's ISO 8601 timestamp to milliseconds since the epoch, or None."""
+    if not isinstance(timestamp, str):
+        return None
+    try:
+        moment = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return max(0, int(moment.timestamp() * 1000))
+
+
+def time_window(args):
+    """Compile --since/--until into bounds for session_span, or None without them.
+
+    since and until are milliseconds since the epoch (None when not given);
+    since_day and until_day are the filename dates past which a whole session
+    is certain to start after the bound.
+    """
+    if not (args.since or args.until):
+        return None
+    window = {'since': None, 'until': None, 'since_day': None, 'until_day': None}
+    for bound, value in (('since', args.since), ('until', args.until)):
+        if value:
+            moment = parse_time(value)
+            window[bound] = int(moment.timestamp() * 1000)
+            window[f'{bound}_day'] = (moment + TIME_SLACK).date().isoformat()
+    return window
+
+
 def parse_line_range(range_str):
     """Parse line range like '40-60' into (start, end)."""
     match = re.match(r'^(\d+)-(\d+)$', range_str)
@@ -57,6 +243,21 @@ def parse_line_range(range_str):
     return int(match.group(1)), int(match.group(2))
 
 
+@contextmanager
+def phase(name):
+    """Add the wall time spent in the with-block to PHASES[name].
+
+    Reading, decoding and matching are timed line by line wherever they
+    happen, so a phase that drives them (e.g. 'rank scoring') includes
+    time they also report on their own.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        PHASES[name] += time.perf_counter() - start
+
+
 def extract_text_content(entry):
     """Extract readable text from a transcript entry."""
     entry_type = entry.get('type')
@@ -110,13 +311,83 @@ def extract_thinking_content(entry):
     return None
 
 
+def extract_tool_content(entry, fields):
+    """Extract an entry's tool_use names and tool_result contents, one line each, for fields."""
+    lines = [f"[{field}] {value}" for field in fields for value in field_values(entry, field)]
+    return '\n'.join(lines) or None
+
+
 def is_meta_message(entry):
     """Check if entry is a meta/injected message (skill prompts, system context)."""
     return entry.get('isMeta', False)
 
 
+def _blob_path(digest):
+    """Locate a blob in the content-addressed store."""
+    return BLOB_DIR / digest[:2] / f"{digest}.json"
+
+
+@lru_cache(maxsize=64)
+def load_blob(digest):
+    """Load a blob's JSON value; identical prompts are read once per process."""
+    STATS['blobs loaded'] += 1
+    try:
+        with open(_blob_path(digest), 'rb') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return f"[missing blob {digest}]"
+
+
+def resolve_blobs(entry):
+    """Replace a compacted message content reference with the content it names."""
+    message = entry.get('message')
+    if isinstance(message, dict):
+        content = message.get('content')
+        if isinstance(content, dict) and '$blob' in content:
+            message['content'] = load_blob(content['$blob'])
+    return entry
+
+
+def field_values(entry, field):
+    """Return the strings of an entry that a pattern scoped to field is matched against.
+
+    role is the message's role (or the entry type for entries without one);
+    meta is the text of meta messages only; the others are the text, thinking,
+    tool_use names or tool_result contents of the message's content items.
+    """
+    message = entry.get('message')
+    if not isinstance(message, dict):
+        message = {}
+    if field == 'role':
+        return [message.get('role') or entry.get('type') or '']
+    if field == 'meta' and not is_meta_message(entry):
+        return []
+    resolve_blobs(entry)
+    content = message.get('content')
+    kind, key = QUERY_FIELDS[field]
+    if isinstance(content, str):
+        return [content] if kind == 'text' else []
+    values = []
+    for item in content if isinstance(content, list) else ():
+        if isinstance(item, dict) and item.get('type') == kind:
+            value = item.get(key, '')
+            if isinstance(value, list):
+                # A tool result's content may be a list of text (and image) parts
+                value = ' '.join(part.get('text', '') for part in value if isinstance(part, dict))
+            values.append(value if isinstance(value, str) else json.dumps(value))
+    return values
+
+
 def should_include_entry(entry, args):
     """Check if entry should be included based on filters."""
+    if _passes_filters(entry, args):
+        return True
+    STATS['lines filtered'] += 1
+    return False
+
+
+def _passes_filters(entry, args):
+    """Apply the --include-meta, --user-only, --assistant-only and --text-only filters."""
     entry_type = entry.get('type')
 
     # Filter meta messages (skill prompts) unless explicitly requested
@@ -133,168 +404,2732 @@ def should_include_entry(entry, args):
     return True
 
 
+def format_text(text, thinking, line_num, filepath, tools=None):
+    """Format extracted text (and optional thinking and tool content) as an output line."""
+    for extra in (thinking, tools):
+        if extra:
+            text = f"{text}\n{extra}" if text else extra
+    if text:
+        return f"{filepath}:{line_num}: {text}"
+    return None
+
+
 def format_entry(entry, line_num, filepath, args):
     """Format a transcript entry for output."""
+    resolve_blobs(entry)
     if args.text_only:
-        text = extract_text_content(entry)
-        if args.include_thinking:
-            thinking = extract_thinking_content(entry)
-            if thinking:
-                text = f"{text}\n{thinking}" if text else thinking
-        if text:
-            return f"{filepath}:{line_num}: {text}"
-        return None
+        thinking = extract_thinking_content(entry) if args.include_thinking else None
+        tools = extract_tool_content(entry, args.include_tools) if args.include_tools else None
+        return format_text(extract_text_content(entry), thinking, line_num, filepath, tools)
     else:
         # Return raw JSON
         return f"{filepath}:{line_num}: {json.dumps(entry)}"
 
 
-def read_transcript(filepath, args):
-    """Read and filter a transcript file."""
-    lines = []
-    with open(filepath, 'r') as f:
-        for line_num, line in enumerate(f, 1):
-            line = line.strip()
-            if not line:
+class RecordWriter:
+    """Stream --format ndjson records to stdout through a write buffer.
+
+    Records are joined into chunks of NDJSON_BUFFER_BYTES before being
+    written, and on flush() or leaving a with-block. Transcript line records
+    carry the line's byte offset (for --from-offset) and the entry's type,
+    role and timestamp, read back through the line-offset sidecar.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+        for _, f in self.files.values():
+            f.close()
+
+    def write(self, record):
+        """Buffer one record as a line of JSON."""
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self.chunks.append(line)
+        self.size += len(line)
+        if self.size >= NDJSON_BUFFER_BYTES:
+            self.flush()
+
+    def flush(self):
+        """Write out the buffered records."""
+        if self.chunks:
+            sys.stdout.write(''.join(self.chunks))
+            self.chunks, self.size = [], 0
+        sys.stdout.flush()
+
+    def entry(self, filepath, line_num, formatted, spans=(), **fields):
+        """Buffer the record for a formatted transcript line.
+
+        spans are (start, end) character ranges in formatted; they are
+        given relative to the record's text, which drops the path:line:
+        prefix. Extra fields are added to the record as they are.
+        """
+        offset, entry = self._read(filepath, line_num)
+        self.located_entry(filepath, line_num, offset, entry, formatted, spans, **fields)
+
+    def located_entry(self, filepath, line_num, offset, entry, formatted, spans=(), **fields):
+        """Buffer a line's record as entry() does, given its offset and decoded entry."""
+        message = entry.get('message')
+        prefix = len(f"{filepath}:{line_num}: ")
+        record = {
+            'path': str(filepath),
+            'line': line_num,
+            'offset': offset,
+            'type': entry.get('type'),
+            'role': message.get('role') if isinstance(message, dict) else None,
+            'timestamp': entry.get('timestamp'),
+            'text': formatted[prefix:],
+            'spans': [[max(start, prefix) - prefix, end - prefix]
+                      for start, end in spans if end > prefix],
+        }
+        record.update(fields)
+        self.write(record)
+
+    def _read(self, filepath, line_num):
+        """Return (offset, skeleton entry) for a transcript line."""
+        key = str(filepath)
+        if key not in self.files:
+            self.files[key] = (line_offsets(filepath), open_transcript(filepath))
+        offsets, f = self.files[key]
+        if line_num >= len(offsets):
+            # The transcript has grown since (with --follow)
+            offsets = line_offsets(filepath)
+            self.files[key] = (offsets, f)
+        line = _read_line(f, offsets, line_num)
+        entry = decode_text_fields(line, thinking=False)
+        return offsets[line_num - 1], entry if isinstance(entry, dict) else {}
+
+
+def match_spans(query, formatted):
+    """Return the merged (start, end) ranges of formatted matched by the query's positive patterns.
+
+    Field-scoped patterns are matched against fields rather than the
+    formatted text, so mark nothing in it.
+    """
+    found = sorted((match.start(), match.end())
+                   for field, regex in query['any_of'] + query['all_of'] if field is None
+                   for match in regex.finditer(formatted) if match.end() > match.start())
+    spans = []
+    for start, end in found:
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], max(spans[-1][1], end))
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def ensure_cache_dir():
+    """Create the cache directory, keeping it out of the .tutor/ git repo."""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    gitignore = CACHE_DIR / ".gitignore"
+    if not gitignore.exists():
+        gitignore.write_text("*\n")
+
+
+def _tail_checksum(f, offset):
+    """Checksum the bytes just before offset, to detect rewritten files."""
+    start = max(0, offset - TAIL_CHECKSUM_BYTES)
+    f.seek(start)
+    return zlib.crc32(f.read(offset - start))
+
+
+def _can_resume(f, offset, tail):
+    """Check whether a scan of transcript f that stopped at offset can pick up there.
+
+    tail is the _tail_checksum the scan recorded at offset. The file must
+    still reach offset and end the same way just before it; otherwise it
+    was rewritten and is scanned again from the start.
+    """
+    return f.seek(0, os.SEEK_END) >= offset and _tail_checksum(f, offset) == tail
+
+
+def _sidecar_path(filepath, kind):
+    """Locate a transcript's sidecar of the given kind (offsets, times) in the cache."""
+    filepath = Path(filepath)
+    key = hashlib.sha1(str(filepath.resolve()).encode()).hexdigest()[:12]
+    return CACHE_DIR / kind / f"{filepath.name}.{key}.idx"
+
+
+def _load_sidecar(sidecar, version, f, parts):
+    """Load what an earlier scan of transcript f recorded in a sidecar.
+
+    A sidecar is an array('Q') of [version, offset, lines, tail checksum,
+    the lengths of parts arrays, the arrays...], written by _update_sidecar
+    for a scan that stopped after line lines, offset bytes in. Returns
+    (offset, lines, arrays) to resume the scan from, or (0, 0, empty
+    arrays) when the sidecar is missing, from another version or no longer
+    matches the transcript.
+    """
+    stored = array('Q')
+    try:
+        with open(sidecar, 'rb') as data:
+            stored.frombytes(data.read())
+    except (OSError, ValueError):
+        pass
+    header = 4 + parts
+    if (len(stored) >= header and stored[0] == version
+            and sum(stored[4:header]) == len(stored) - header
+            and _can_resume(f, stored[1], stored[3])):
+        arrays = []
+        start = header
+        for length in stored[4:header]:
+            arrays.append(stored[start:start + length])
+            start += length
+        return stored[1], stored[2], arrays
+    return 0, 0, [array('Q') for _ in range(parts)]
+
+
+def _update_sidecar(sidecar, version, f, offset, lines, arrays):
+    """Record in a sidecar what a scan of transcript f found up to offset, after line lines."""
+    data = array('Q', [version, offset, lines, _tail_checksum(f, offset)])
+    data.extend(len(part) for part in arrays)
+    for part in arrays:
+        data.extend(part)
+    _save_sidecar(sidecar, data)
+
+
+def line_offsets(filepath):
+    """Return an array('Q') of the byte offset where each line starts.
+
+    Element k-1 is the start of line k; the last element is the end of the
+    last complete line. The array is kept in a sidecar and extended when
+    the transcript grows, so only newly appended bytes are scanned.
+    """
+    sidecar = _sidecar_path(filepath, "offsets")
+    with open_transcript(filepath) as f:
+        start, _, (offsets,) = _load_sidecar(sidecar, OFFSETS_VERSION, f, 1)
+        if not offsets:
+            offsets.append(0)
+        pos = start
+        f.seek(pos)
+        while chunk := f.read(1 << 20):
+            i = chunk.find(b'\n')
+            while i != -1:
+                offsets.append(pos + i + 1)
+                i = chunk.find(b'\n', i + 1)
+            pos += len(chunk)
+        STATS['bytes read'] += pos - start
+
+        if offsets[-1] != start:
+            _update_sidecar(sidecar, OFFSETS_VERSION, f, offsets[-1], len(offsets) - 1, [offsets])
+    return offsets
+
+
+def _save_sidecar(sidecar, data):
+    """Atomically write an array to a sidecar file, if the cache is available."""
+    if not CACHE_DIR.parent.exists():
+        return
+    try:
+        ensure_cache_dir()
+        sidecar.parent.mkdir(exist_ok=True)
+        tmp = sidecar.with_suffix(f".tmp{os.getpid()}")
+        with open(tmp, 'wb') as f:
+            data.tofile(f)
+        os.replace(tmp, sidecar)
+    except OSError:
+        pass
+
+
+def _line_timestamp(line):
+    """Return the top-level timestamp of a raw transcript line, decoding nothing else."""
+    line = line.strip()
+    if len(line) >= SELECTIVE_DECODE_BYTES:
+        try:
+            return _object_fields(line, 0, {b'timestamp': _scalar_field})[0].get('timestamp')
+        except (ValueError, IndexError):
+            pass
+    entry = decode_line(line)
+    return entry.get('timestamp') if isinstance(entry, dict) else None
+
+
+def time_index(filepath):
+    """Return (times, lines): where a transcript's latest timestamp so far rises.
+
+    times[k] is the latest timestamp (in milliseconds since the epoch) of
+    lines 1 through lines[k], first reached at line lines[k]. Both arrays
+    ascend, so the first line at or after a moment is found by bisection;
+    a line without a timestamp, or with an earlier one than a line before
+    it, belongs to the time of the lines before it (leading ones, to the
+    first timestamp). The arrays are kept in a sidecar and extended when
+    the transcript grows. A trailing partial line is included but not
+    kept.
+    """
+    sidecar = _sidecar_path(filepath, "times")
+    with open_transcript(filepath) as f:
+        start, known, (times, lines) = _load_sidecar(sidecar, TIMES_VERSION, f, 2)
+        offset, count = start, len(times)
+        line_num = complete = known
+        f.seek(offset)
+        for raw in f:
+            line_num += 1
+            STATS['bytes read'] += len(raw)
+            moment = timestamp_ms(_line_timestamp(raw))
+            if moment is not None and (not times or moment > times[-1]):
+                times.append(moment)
+                lines.append(line_num)
+            if raw.endswith(b'\n'):
+                offset += len(raw)
+                complete, count = line_num, len(times)
+
+        if offset != start:
+            _update_sidecar(sidecar, TIMES_VERSION, f, offset, complete,
+                            [times[:count], lines[:count]])
+    return times, lines
+
+
+def session_span(filepath, window, mtime_ns=None):
+    """Return the (start, end) lines of a transcript within a time window, or None.
+
+    end is None when the span runs to the end of the file; with no window
+    the span is the whole file. A session is skipped or taken whole from
+    its filename date and mtime when they clear the window's bounds by
+    TIME_SLACK, without opening it; otherwise the span is found by
+    bisection in its time index.
+    """
+    if window is None:
+        return 1, None
+    if mtime_ns is None:
+        try:
+            mtime_ns = os.stat(filepath).st_mtime_ns
+        except OSError:
+            return None
+    name = Path(filepath).name
+    dated = SESSION_DATE.match(name)
+    # The last entry was written by the time of the last write
+    written = mtime_ns // 1_000_000 + TIME_SLACK // timedelta(milliseconds=1)
+    since, until = window['since'], window['until']
+    if since is not None and written < since:
+        return None
+    if until is not None and dated and name[:10] > window['until_day']:
+        return None
+    check_since = since is not None and not (dated and name[:10] > window['since_day'])
+    check_until = until is not None and written >= until
+    if not (check_since or check_until):
+        return 1, None
+
+    STATS['time index lookups'] += 1
+    times, lines = time_index(filepath)
+    start, end = 1, None
+    if check_since:
+        i = bisect.bisect_left(times, since)
+        if i == len(times):
+            return None
+        start = lines[i] if i else 1
+    if check_until:
+        i = bisect.bisect_left(times, until)
+        if i == 0:
+            return None
+        if i < len(times):
+            end = lines[i] - 1
+    if end is not None and end < start:
+        return None
+    return start, end
+
+
+def _in_span(line_num, span):
+    """Check whether a line falls inside a session_span result."""
+    return span is not None and span[0] <= line_num and (span[1] is None or line_num <= span[1])
+
+
+class BlockArchive(io.RawIOBase):
+    """Seekable reader over the uncompressed lines of an archived transcript.
+
+    Only the blocks that reads touch are decompressed, one at a time; wrap it
+    in io.BufferedReader (see open_transcript) for line iteration.
+    """
+
+    def __init__(self, filepath):
+        super().__init__()
+        self.file = open(filepath, 'rb')
+        try:
+            header = self.file.read(12)
+            if header[:4] != b'\x1f\x8b\x08\x04':
+                raise ValueError(f"{filepath} is not a transcript archive")
+            extra = self.file.read(struct.unpack('<H', header[10:12])[0])
+            if extra[:2] != ARCHIVE_INDEX_ID or extra[4] != ARCHIVE_INDEX_VERSION:
+                raise ValueError(f"{filepath} has no block index")
+            payload = extra[5:4 + struct.unpack('<H', extra[2:4])[0]]
+            index = struct.unpack(f'<{len(payload) // 4}I', payload)
+        except (ValueError, IndexError, struct.error):
+            self.file.close()
+            raise
+        # The empty member's deflate data and trailer take 10 bytes
+        position = 12 + len(extra) + 10
+        self.starts, self.blocks, self.first_lines = [], [], []
+        raw = 0
+        line = 1
+        for compressed, size, lines in zip(index[0::3], index[1::3], index[2::3]):
+            self.starts.append(raw)
+            self.blocks.append((position, compressed))
+            self.first_lines.append(line)
+            position += compressed
+            raw += size
+            line += lines
+        self.size = raw
+        self.pos = 0
+        self.cached = (None, b'')
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self.pos, os.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def _block(self, i):
+        """Return block i's uncompressed bytes, keeping the last one decompressed."""
+        if self.cached[0] != i:
+            position, compressed = self.blocks[i]
+            self.file.seek(position)
+            STATS['archive bytes read'] += compressed
+            self.cached = (i, zlib.decompress(self.file.read(compressed), 31))
+        return self.cached[1]
+
+    def readinto(self, buffer):
+        if self.pos >= self.size:
+            return 0
+        i = bisect.bisect_right(self.starts, self.pos) - 1
+        data = self._block(i)
+        chunk = data[self.pos - self.starts[i]:self.pos - self.starts[i] + len(buffer)]
+        buffer[:len(chunk)] = chunk
+        self.pos += len(chunk)
+        return len(chunk)
+
+    def line_start(self, line_num):
+        """Return (offset, line) of the start of the block holding line_num."""
+        if not self.starts:
+            return 0, 1
+        i = max(0, bisect.bisect_right(self.first_lines, line_num) - 1)
+        return self.starts[i], self.first_lines[i]
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+def is_archive(filepath):
+    """Check whether a transcript path names a block archive."""
+    return str(filepath).endswith(ARCHIVE_SUFFIX)
+
+
+def open_transcript(filepath):
+    """Open a transcript for binary reading, transparently decompressing archives."""
+    if is_archive(filepath):
+        return io.BufferedReader(BlockArchive(filepath), buffer_size=64 * 1024)
+    return open(filepath, 'rb')
+
+
+def transcript_files(directory=TRANSCRIPT_DIR):
+    """List a directory's transcripts, archived or not."""
+    return list(directory.glob("*.jsonl")) + list(directory.glob(f"*{ARCHIVE_SUFFIX}"))
+
+
+def _archive_blocks(f, block_bytes):
+    """Yield (compressed, size, lines) for blocks of whole lines read from f."""
+    block = []
+    size = 0
+    for line in f:
+        block.append(line)
+        size += len(line)
+        if size >= block_bytes:
+            yield block, size
+            block, size = [], 0
+    if block:
+        yield block, size
+
+
+def archive_transcript(filepath):
+    """Compress a transcript into a block archive beside it, then remove it.
+
+    The archive is read back and checked against the original before the
+    original is deleted. An existing archive of the same session is never
+    overwritten; FileExistsError is raised instead. Returns the archive's
+    path.
+    """
+    filepath = Path(filepath)
+    target = filepath.with_name(filepath.name[:-len(".jsonl")] + ARCHIVE_SUFFIX)
+    if target.exists():
+        raise FileExistsError(f"{target} already exists")
+    tmp = target.with_name(f"{target.name}.tmp{os.getpid()}")
+    block_bytes = ARCHIVE_BLOCK_BYTES
+    while True:
+        index = []
+        members = tmp.with_name(tmp.name + ".members")
+        with open(filepath, 'rb') as f, open(members, 'wb') as out:
+            for lines, size in _archive_blocks(f, block_bytes):
+                member = zlib.compressobj(9, zlib.DEFLATED, 31)
+                data = member.compress(b''.join(lines)) + member.flush()
+                out.write(data)
+                index.extend((len(data), size, len(lines)))
+        # Little-endian like the rest of the gzip header, whatever wrote it
+        extra_payload = bytes([ARCHIVE_INDEX_VERSION]) + struct.pack(f'<{len(index)}I', *index)
+        if len(extra_payload) <= 0xFFFF - 4:
+            break
+        block_bytes *= 2
+
+    extra = ARCHIVE_INDEX_ID + struct.pack('<H', len(extra_payload)) + extra_payload
+    empty = zlib.compressobj(9, zlib.DEFLATED, -15).flush()
+    header = (b'\x1f\x8b\x08\x04' + b'\x00' * 4 + b'\x00\xff' + struct.pack('<H', len(extra))
+              + extra + empty + struct.pack('<II', 0, 0))
+    try:
+        with open(tmp, 'wb') as out, open(members, 'rb') as data:
+            out.write(header)
+            while chunk := data.read(1 << 20):
+                out.write(chunk)
+        with open(filepath, 'rb') as original, io.BufferedReader(BlockArchive(tmp)) as archived:
+            while chunk := original.read(1 << 20):
+                if archived.read(len(chunk)) != chunk:
+                    raise ValueError(f"archive of {filepath} does not match it")
+            if archived.read(1):
+                raise ValueError(f"archive of {filepath} does not match it")
+        # Keep the last write time, which --since relies on
+        stat = filepath.stat()
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp, target)
+    finally:
+        members.unlink(missing_ok=True)
+        tmp.unlink(missing_ok=True)
+    filepath.unlink()
+    return target
+
+
+def archive_sessions(args):
+    """Archive transcripts whose session date and last write are older than --archive."""
+    cutoff = datetime.now() - parse_duration(args.archive)
+    cutoff_day = cutoff.date().isoformat()
+    before = after = count = skipped = 0
+    for filepath in sorted(TRANSCRIPT_DIR.glob("*.jsonl")):
+        stat = filepath.stat()
+        if not SESSION_DATE.match(filepath.name) or filepath.name[:10] > cutoff_day:
+            continue
+        # A session dated before the cutoff may still be writing if it is recent
+        if datetime.fromtimestamp(stat.st_mtime) >= cutoff:
+            continue
+        size = stat.st_size
+        try:
+            target = archive_transcript(filepath)
+        except FileExistsError as e:
+            print(f"{filepath}: not archived, {e}", file=sys.stderr)
+            skipped += 1
+            continue
+        before += size
+        after += target.stat().st_size
+        count += 1
+        print(f"{filepath} -> {target}")
+    if count:
+        print(f"Archived {count} sessions: {format_size(before)} -> {format_size(after)}")
+    elif not skipped:
+        print(f"No sessions older than {args.archive}")
+
+
+def _store_blob(value):
+    """Write a JSON value to the blob store if it isn't there, returning its digest."""
+    data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+    return digest
+
+
+def _compact_line(line):
+    """Return line with a large meta message's content moved to the blob store, or None."""
+    if len(line) < COMPACT_MIN_BYTES or b'"isMeta"' not in line:
+        return None
+    entry = decode_line(line)
+    if not isinstance(entry, dict) or not is_meta_message(entry):
+        return None
+    message = entry.get('message')
+    if not isinstance(message, dict) or isinstance(message.get('content'), (dict, type(None))):
+        return None
+    content = message['content']
+    message['content'] = {'$blob': _store_blob(content)}
+    compacted = json.dumps(entry, ensure_ascii=False, separators=(',', ':')).encode()
+    if len(compacted) >= len(line):
+        return None
+    if resolve_blobs(json.loads(compacted)) != decode_line(line):
+        raise ValueError("compacted entry does not round-trip")
+    return compacted + b'\n'
+
+
+def compact_transcript(filepath):
+    """Rewrite a transcript with its large meta contents moved to the blob store.
+
+    Untouched lines are copied byte for byte, and the file keeps its mtime.
+    Returns (entries compacted, bytes saved); a transcript written to while
+    being compacted is left alone.
+    """
+    stat = filepath.stat()
+    tmp = filepath.with_name(f"{filepath.name}.tmp{os.getpid()}")
+    compacted = saved = 0
+    try:
+        with open(filepath, 'rb') as f, open(tmp, 'wb') as out:
+            for line in f:
+                replacement = _compact_line(line) if line.endswith(b'\n') else None
+                if replacement is not None:
+                    compacted += 1
+                    saved += len(line) - len(replacement)
+                    line = replacement
+                out.write(line)
+        current = filepath.stat()
+        if not compacted or (current.st_size, current.st_mtime_ns) != (stat.st_size, stat.st_mtime_ns):
+            return 0, 0
+        os.utime(tmp, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        os.replace(tmp, filepath)
+        return compacted, saved
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def compact_sessions(args):
+    """Compact every idle transcript's meta messages into the blob store."""
+    idle = time.time() - COMPACT_IDLE_SECONDS
+    sessions = entries = saved = 0
+    for filepath in sorted(TRANSCRIPT_DIR.glob("*.jsonl")):
+        if filepath.stat().st_mtime > idle:
+            continue
+        compacted, freed = compact_transcript(filepath)
+        if compacted:
+            sessions += 1
+            entries += compacted
+            saved += freed
+            print(f"{filepath}: {compacted} meta messages, {format_size(freed)} saved")
+    print(f"Compacted {entries} meta messages in {sessions} sessions, {format_size(saved)} saved")
+
+
+def decode_line(line):
+    """Decode one raw transcript line, returning None for blank or invalid JSON."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+def _skip_ws(buf, pos):
+    """Return the first non-whitespace position at or after pos."""
+    return JSON_WS.match(buf, pos).end()
+
+
+def _string_end(buf, pos):
+    """Return the index just past the JSON string that starts at pos.
+
+    Candidate closing quotes are those followed by a structural character;
+    escaped ones are stepped over, but a string dense with them gives up
+    (raising ValueError) so the caller can fall back to json.loads.
+    """
+    if buf[pos] != 0x22:
+        raise ValueError("expected string")
+    end = pos
+    for _ in range(SELECTIVE_SCAN_STEPS):
+        match = JSON_STRING_CLOSE.search(buf, end + 1)
+        if match is None:
+            raise ValueError("unterminated string")
+        end = match.start()
+        escape = end - 1
+        while buf[escape] == 0x5c:
+            escape -= 1
+        if (end - 1 - escape) % 2 == 0:
+            return end + 1
+    raise ValueError("too many escaped quotes to scan")
+
+
+def _value_end(buf, pos):
+    """Return the index just past the JSON value at pos, without decoding it."""
+    if buf[pos] == 0x22:
+        return _string_end(buf, pos)
+    if buf[pos] not in b'{[':
+        match = JSON_SCALAR_END.search(buf, pos)
+        return match.start() if match else len(buf)
+    depth = 0
+    for _ in range(SELECTIVE_SCAN_STEPS):
+        match = JSON_STRUCTURE.search(buf, pos)
+        if match is None:
+            raise ValueError("unterminated container")
+        pos = match.start()
+        if buf[pos] == 0x22:
+            pos = _string_end(buf, pos)
+            continue
+        depth += 1 if buf[pos] in b'{[' else -1
+        pos += 1
+        if depth == 0:
+            return pos
+    raise ValueError("too many nested values to scan")
+
+
+def _scalar_field(buf, pos):
+    """Parser for _object_fields: fully decode the value at pos."""
+    end = _value_end(buf, pos)
+    return json.loads(buf[pos:end]), end
+
+
+def _span_field(buf, pos):
+    """Parser for _object_fields: record where the value is, for later decoding."""
+    end = _value_end(buf, pos)
+    return (pos, end), end
+
+
+def _object_fields(buf, pos, fields):
+    """Decode selected members of the JSON object at pos.
+
+    fields maps member keys to parsers called as parser(buf, start), each
+    returning (value, end); other members are stepped over undecoded.
+    Returns ({key: value}, end).
+    """
+    if buf[pos] != 0x7b:
+        raise ValueError("expected object")
+    found = {}
+    pos = _skip_ws(buf, pos + 1)
+    if buf[pos] == 0x7d:
+        return found, pos + 1
+    while True:
+        key_end = _string_end(buf, pos)
+        key = buf[pos + 1:key_end - 1]
+        pos = _skip_ws(buf, key_end)
+        if buf[pos] != 0x3a:
+            raise ValueError("expected ':'")
+        pos = _skip_ws(buf, pos + 1)
+        parser = fields.get(key)
+        if parser:
+            found[key.decode()], pos = parser(buf, pos)
+        else:
+            pos = _value_end(buf, pos)
+        pos = _skip_ws(buf, pos)
+        if buf[pos] == 0x7d:
+            return found, pos + 1
+        if buf[pos] != 0x2c:
+            raise ValueError("expected ','")
+        pos = _skip_ws(buf, pos + 1)
+
+
+def _content_item_field(buf, pos, keep, members):
+    """Decode a message content item, keeping only type and the member keep names for it."""
+    if buf[pos] != 0x7b:
+        return None, _value_end(buf, pos)
+    item, end = _object_fields(buf, pos, members)
+    spans = {key: item.pop(key) for key in list(item) if key != 'type'}
+    wanted = keep.get(item.get('type'))
+    if wanted in spans:
+        start, stop = spans[wanted]
+        item[wanted] = json.loads(buf[start:stop])
+    return item, end
+
+
+def _content_field(buf, pos, keep, members):
+    """Parser for a message's content: a string, or a list of content items."""
+    if buf[pos] != 0x5b:
+        return _scalar_field(buf, pos)
+    items = []
+    pos = _skip_ws(buf, pos + 1)
+    if buf[pos] == 0x5d:
+        return items, pos + 1
+    while True:
+        item, pos = _content_item_field(buf, pos, keep, members)
+        items.append(item)
+        pos = _skip_ws(buf, pos)
+        if buf[pos] == 0x5d:
+            return items, pos + 1
+        if buf[pos] != 0x2c:
+            raise ValueError("expected ','")
+        pos = _skip_ws(buf, pos + 1)
+
+
+def _message_field(buf, pos, keep, members):
+    """Parser for an entry's message, keeping only role and content."""
+    if buf[pos] != 0x7b:
+        return _scalar_field(buf, pos)
+    return _object_fields(buf, pos, {
+        b'role': _scalar_field,
+        b'content': partial(_content_field, keep=keep, members=members),
+    })
+
+
+def decode_fields(line, keep):
+    """Decode only a skeleton of a raw transcript line.
+
+    The skeleton has type, isMeta, timestamp and message role and content, in
+    which content items keep only their type plus the member keep maps
+    that type to (e.g. {'text': 'text'} for text-only output). Tool results,
+    tool inputs and any other large values not asked for are stepped over
+    without being decoded, and every byte is scanned once. Short lines, and
+    lines the scanner can't step through cheaply, go through json.loads
+    instead.
+    """
+    line = line.strip()
+    if len(line) < SELECTIVE_DECODE_BYTES:
+        return decode_line(line)
+    members = {b'type': _scalar_field}
+    members.update((key.encode(), _span_field) for key in keep.values())
+    try:
+        entry, _ = _object_fields(line, 0, {
+            b'type': _scalar_field,
+            b'isMeta': _scalar_field,
+            b'timestamp': _scalar_field,
+            b'message': partial(_message_field, keep=keep, members=members),
+        })
+        return entry
+    except (ValueError, IndexError):
+        return decode_line(line)
+
+
+def decode_text_fields(line, thinking=True):
+    """Decode the skeleton text-only output needs: text, and thinking if requested."""
+    return decode_fields(line, THINKING_ITEMS if thinking else TEXT_ITEMS)
+
+
+def field_items(fields, keep=None):
+    """Add the content item members that query fields are read from to keep."""
+    keep = dict(keep or {})
+    keep.update(QUERY_FIELDS[field] for field in fields if QUERY_FIELDS[field])
+    return keep
+
+
+def entry_decoder(args, fields=()):
+    """Pick the line decoder for the current output mode and any query fields."""
+    if args.text_only:
+        keep = THINKING_ITEMS if args.include_thinking else TEXT_ITEMS
+        return partial(decode_fields, keep=field_items(fields, keep))
+    return decode_line
+
+
+def iter_entries(filepath, start=1, end=None, prefilter=None, decode=decode_line):
+    """Lazily yield (line_num, entry) for each JSON line of a transcript.
+
+    Reading seeks straight to line start using the line-offset sidecar, and
+    stops after line end, so only the requested part of the file is parsed.
+    Lines for which prefilter(raw_bytes) is false are skipped undecoded, and
+    the rest are decoded with decode (e.g. decode_text_fields). The time
+    spent reading, prefiltering and decoding goes to PHASES.
+    """
+    # A phase() block per line would cost more than the work it times
+    clock = time.perf_counter
+    reading = prefiltering = decoding = 0.0
+    with open_transcript(filepath) as f:
+        first = 1
+        if start > 1 and is_archive(filepath):
+            # Archives carry the first line of each block; start at start's block
+            offset, first = f.raw.line_start(start)
+            f.seek(offset)
+        elif start > 1:
+            offsets = line_offsets(filepath)
+            first = min(start, len(offsets))
+            f.seek(offsets[first - 1])
+        begin = f.tell()
+        try:
+            mark = clock()
+            for line_num, line in enumerate(f, first):
+                now = clock()
+                reading += now - mark
+                mark = now
+                if line_num < start:
+                    continue
+                if end is not None and line_num > end:
+                    break
+                if prefilter:
+                    candidate = prefilter(line)
+                    mark = clock()
+                    prefiltering += mark - now
+                    if not candidate:
+                        STATS['lines prefiltered out'] += 1
+                        continue
+                STATS['lines decoded'] += 1
+                entry = decode(line)
+                decoding += clock() - mark
+                if entry is not None:
+                    yield line_num, entry
+                mark = clock()
+        finally:
+            STATS['bytes read'] += f.tell() - begin
+            PHASES['reading'] += reading
+            if prefilter:
+                PHASES['prefiltering'] += prefiltering
+            PHASES['JSON decoding'] += decoding
+
+
+def read_transcript(filepath, args, start=1, end=None, prefilter=None):
+    """Lazily yield (line_num, formatted) for the filtered entries of a transcript."""
+    lines = iter_entries(filepath, start, end, prefilter, decode=entry_decoder(args))
+    for line_num, entry in lines:
+        if should_include_entry(entry, args):
+            before = time.perf_counter()
+            formatted = format_entry(entry, line_num, filepath, args)
+            PHASES['formatting'] += time.perf_counter() - before
+            if formatted:
+                yield line_num, formatted
+
+
+def _all_of(needs):
+    """Combine literal requirements that must all hold."""
+    needs = [need for need in needs if need is not None]
+    if not needs:
+        return None
+    if len(needs) == 1:
+        return needs[0]
+    return ('AND', needs)
+
+
+def _any_of(needs):
+    """Combine literal requirements of which at least one must hold."""
+    if not needs or any(need is None for need in needs):
+        return None
+    if len(needs) == 1:
+        return needs[0]
+    return ('OR', needs)
+
+
+def _sequence_requirements(items):
+    """Collect the literal requirements of a parsed regex sequence."""
+    needs = []
+    run = []
+
+    def flush():
+        if run:
+            needs.append(''.join(run))
+            run.clear()
+
+    for op, av in items:
+        name = str(op)
+        if name == 'LITERAL' and av < 128:
+            run.append(chr(av).lower())
+            continue
+        flush()
+        if name == 'SUBPATTERN':
+            needs.append(_sequence_requirements(av[-1]))
+        elif name == 'ATOMIC_GROUP':
+            needs.append(_sequence_requirements(av))
+        elif name in ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT') and av[0] >= 1:
+            needs.append(_sequence_requirements(av[2]))
+        elif name == 'BRANCH':
+            needs.append(_any_of([_sequence_requirements(b) for b in av[1]]))
+    flush()
+    return _all_of(needs)
+
+
+def pattern_requirements(pattern):
+    """Derive the lowercase literal substrings every match of pattern contains.
+
+    Returns None when nothing is required, a string for a single literal, or
+    an ('AND'|'OR', [requirements]) tree. Only ASCII literals are collected so
+    the result stays valid under case-insensitive matching.
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except (re.error, TypeError, ValueError):
+        return None
+    return _sequence_requirements(parsed)
+
+
+def prune_requirements(need, pieces):
+    """Rewrite each literal in need as the AND of pieces(literal).
+
+    Consumers use this to drop literals they cannot test; an OR branch that
+    loses all its literals makes the whole OR unconstrained.
+    """
+    if need is None:
+        return None
+    if isinstance(need, (str, bytes)):
+        return _all_of(pieces(need))
+    op, children = need
+    pruned = [prune_requirements(child, pieces) for child in children]
+    return _all_of(pruned) if op == 'AND' else _any_of(pruned)
+
+
+def _compile_term(pattern):
+    """Compile a pattern into a (field, regex) term; field is None unless the pattern is scoped."""
+    match = FIELD_TERM.match(pattern)
+    field, pattern = match.groups() if match else (None, pattern)
+    return field, re.compile(pattern, re.IGNORECASE)
+
+
+def compile_query(args):
+    """Compile the --grep, --grep-file, --and and --not patterns into one query.
+
+    An entry matches when any --grep pattern and every --and pattern match
+    it and no --not pattern does; with --scope session those conditions
+    apply across the whole session instead. A pattern prefixed with a field
+    name (see QUERY_FIELDS), as in thinking:recursion or tool:Bash, is
+    matched against that field of the entry rather than its formatted text.
+    Unscoped --grep patterns are also joined into a single alternation, so
+    entries are screened with one regex pass before the rest are tried.
+    """
+    patterns = list(args.grep or [])
+    if args.grep_file:
+        with open(args.grep_file) as f:
+            patterns += [line for line in f.read().splitlines() if line.strip()]
+    any_of = [_compile_term(p) for p in patterns]
+    all_of = [_compile_term(p) for p in args.and_patterns or []]
+    none_of = [_compile_term(p) for p in args.not_patterns or []]
+    fields = {field for field, _ in any_of + all_of + none_of if field}
+
+    regexes = [regex for field, regex in any_of if field is None]
+    screen = None
+    if len(regexes) == 1 and len(any_of) == 1:
+        screen = regexes[0]
+    # Numbered backreferences would point at the wrong group once joined
+    elif len(regexes) == len(any_of) > 1 and not any(
+            r.groups and re.search(r'\\[1-9]|\(\?P=', r.pattern) for r in regexes):
+        try:
+            screen = re.compile('|'.join(f'(?:{r.pattern})' for r in regexes), re.IGNORECASE)
+        except re.error:
+            pass
+
+    return {
+        'patterns': patterns,
+        'and': list(args.and_patterns or []),
+        'not': list(args.not_patterns or []),
+        'any_of': any_of,
+        'all_of': all_of,
+        'none_of': none_of,
+        'fields': frozenset(fields),
+        'unscoped': any(field is None for field, _ in any_of + all_of + none_of),
+        'screen': screen,
+        'session': args.scope == 'session',
+    }
+
+
+def query_requirements(query):
+    """Derive the literal requirements of a candidate entry for the query.
+
+    Per entry, that is one --grep pattern's literals plus every --and
+    pattern's. Per session, any entry that could match any pattern
+    (including --not ones) has to be looked at. A field's value appears in
+    the raw line too, so scoped patterns contribute their literals as well.
+    """
+    def needs(terms):
+        return [pattern_requirements(regex.pattern) for _, regex in terms]
+    if query['session']:
+        return _any_of(needs(query['any_of'] + query['all_of'] + query['none_of']))
+    return _all_of([_any_of(needs(query['any_of']))] + needs(query['all_of']))
+
+
+def _term_hit(term, text, entry):
+    """Check whether one query term matches an entry's formatted text or scoped field."""
+    field, regex = term
+    if field is None:
+        return regex.search(text) is not None
+    match = regex.fullmatch if field in NAME_FIELDS else regex.search
+    return any(match(value) for value in field_values(entry, field))
+
+
+def _any_pattern(query, text, entry=None):
+    """Check whether any --grep pattern matches the entry."""
+    if query['screen']:
+        return query['screen'].search(text) is not None
+    return any(_term_hit(term, text, entry) for term in query['any_of'])
+
+
+def query_hit(query, text, entry=None):
+    """Check whether an entry matches the query on its own.
+
+    text is the entry's formatted line; entry, the decoded entry, is only
+    needed for queries with field-scoped patterns.
+    """
+    STATS['regex evaluations'] += 1
+    before = time.perf_counter()
+    hit = (_any_pattern(query, text, entry)
+           and all(_term_hit(term, text, entry) for term in query['all_of'])
+           and not any(_term_hit(term, text, entry) for term in query['none_of']))
+    PHASES['regex matching'] += time.perf_counter() - before
+    return hit
+
+
+def session_hits(query, lines, limit):
+    """Evaluate a session-scoped query over a session's (line_num, formatted, entry) entries.
+
+    Returns {line_num: formatted} for up to limit entries matching any
+    positive pattern when the session as a whole satisfies the query, or
+    None when it doesn't. entry may be None unless the query has
+    field-scoped patterns.
+    """
+    hits = {}
+    found_any = False
+    found_all = set()
+    for line_num, formatted, entry in lines:
+        STATS['regex evaluations'] += 1
+        before = time.perf_counter()
+        excluded = any(_term_hit(term, formatted, entry) for term in query['none_of'])
+        matched_any = not excluded and _any_pattern(query, formatted, entry)
+        matched_all = set() if excluded else {i for i, term in enumerate(query['all_of'])
+                                              if _term_hit(term, formatted, entry)}
+        PHASES['regex matching'] += time.perf_counter() - before
+        if excluded:
+            return None
+        if not matched_any and not matched_all:
+            continue
+        found_any = found_any or matched_any
+        found_all |= matched_all
+        if len(hits) < limit:
+            hits[line_num] = formatted
+        elif not query['none_of'] and found_any and len(found_all) == len(query['all_of']):
+            break
+    if found_any and len(found_all) == len(query['all_of']):
+        return hits
+    return None
+
+
+# Pattern literals are split at characters that JSON may escape or that
+# json.dumps may re-space, leaving pieces that appear verbatim in a raw line.
+RAW_PIECE_SEPARATORS = re.compile(r'[^\x21-\x7e]|["\\/:]')
+# UTF-8 and escaped forms of the non-ASCII characters that fold onto ASCII
+# letters (see CASE_FOLD_HAZARDS), lowercased like the lines they're found in.
+RAW_CASE_FOLD_HAZARDS = (
+    b'\xc4\xb0', b'\xc4\xb1', b'\xc5\xbf', b'\xe2\x84\xaa',
+    b'\\u0130', b'\\u0131', b'\\u017f', b'\\u212a',
+)
+
+
+def text_requirements(need, filepath, args):
+    """Turn literal requirements into strings an entry's own text must contain.
+
+    Matching runs against the formatted line, so pieces that could come from
+    its decoration (path, line number, role labels) are dropped. Without
+    --text-only the line is re-serialized by json.dumps, which may spell
+    numbers and non-ASCII characters differently, so pieces with digits are
+    dropped too.
+    """
+    decoration = [str(filepath).lower(), '[user]', '[assistant]', '[thinking]']
+    if args.text_only:
+        reformatted = str.isdigit
+    else:
+        def reformatted(piece):
+            return any(c.isdigit() for c in piece)
+
+    def pieces(literal):
+        kept = []
+        for piece in RAW_PIECE_SEPARATORS.split(literal):
+            if piece and not reformatted(piece) and not any(piece in d for d in decoration):
+                kept.append(piece)
+        return kept
+
+    return prune_requirements(need, pieces)
+
+
+def raw_requirements(need, filepath, args):
+    """Turn literal requirements into byte strings a raw JSON line must contain."""
+    need = prune_requirements(text_requirements(need, filepath, args), lambda piece: [piece.encode()])
+    if need is not None and args.include_meta:
+        # Compacted meta messages keep their text in the blob store
+        need = ('OR', [need, BLOB_REFERENCE.lower()])
+    return need
+
+
+def _raw_matches(need, line):
+    """Evaluate a raw or text requirement tree against a lowercased line."""
+    if isinstance(need, (bytes, str)):
+        return need in line
+    op, children = need
+    if op == 'AND':
+        return all(_raw_matches(child, line) for child in children)
+    return any(_raw_matches(child, line) for child in children)
+
+
+def raw_candidate(need, line, escaped=None):
+    """Check whether a raw line could match, without decoding it.
+
+    escaped is the requirement tree to use instead when the line has non-ASCII
+    bytes, which json.dumps turns into \\uXXXX escape text.
+    """
+    line = line.lower()
+    if escaped is not None and not line.isascii():
+        need = escaped
+    return _raw_matches(need, line) or any(h in line for h in RAW_CASE_FOLD_HAZARDS)
+
+
+def raw_prefilter(need, args):
+    """Return a raw_candidate check for need, or None if any line could match.
+
+    Without --text-only, a pattern may match inside the escapes json.dumps
+    writes for non-ASCII characters (--grep ude matches the \\ude00 of 😀).
+    A piece can't span the backslash, so only pieces starting with a letter
+    of u or a-f can pick up escape text; lines with non-ASCII bytes are
+    checked without them.
+    """
+    if need is None:
+        return None
+    if args.text_only:
+        return partial(raw_candidate, need)
+    escaped = prune_requirements(need, lambda piece: [] if piece[:1] in b'uabcdef' else [piece])
+    return partial(raw_candidate, need, escaped=escaped or ('AND', []))
+
+
+def text_candidate(need, folded):
+    """Check whether an entry whose lowercased text is folded could match."""
+    return _raw_matches(need, folded) or '\u0131' in folded or '\u017f' in folded
+
+
+# Characters Python's case-insensitive matching folds onto ASCII letters
+# (İ, ı -> i; ſ -> s; K -> k). The index stores them folded so its
+# ASCII-only prefilter never rejects a line the regex would match.
+CASE_FOLD_HAZARDS = str.maketrans({'\u0130': 'i', '\u0131': 'i', '\u017f': 's', '\u212a': 'k'})
+
+
+def open_index():
+    """Open the search index, (re)creating its schema if needed.
+
+    Returns None when SQLite lacks FTS5 trigram support.
+    """
+    ensure_cache_dir()
+    conn = sqlite3.connect(INDEX_PATH, timeout=30)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+            conn.executescript("""
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS entries;
+                DROP TABLE IF EXISTS entries_fts;
+                CREATE TABLE files (
+                    name TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    offset INTEGER,
+                    lines INTEGER,
+                    tail INTEGER
+                );
+                CREATE TABLE entries (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT,
+                    line INTEGER,
+                    type TEXT,
+                    meta INTEGER,
+                    text TEXT,
+                    thinking TEXT,
+                    tokens INTEGER,
+                    thinking_tokens INTEGER
+                );
+                CREATE INDEX entries_name_line ON entries (name, line);
+                CREATE VIRTUAL TABLE entries_fts USING fts5(
+                    body, content='', tokenize='trigram'
+                );
+            """)
+            conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            conn.commit()
+    except sqlite3.OperationalError:
+        conn.close()
+        return None
+    return conn
+
+
+def _index_body(name, line_num, text, thinking):
+    """Build the indexed text: the formatted line with thinking included."""
+    body = format_text(text, thinking, line_num, TRANSCRIPT_DIR / name)
+    return body.translate(CASE_FOLD_HAZARDS)
+
+
+def entry_texts(entry):
+    """Return (text, thinking) for a user or assistant entry with any, else None."""
+    if not isinstance(entry, dict) or entry.get('type') not in ('user', 'assistant'):
+        return None
+    resolve_blobs(entry)
+    text = extract_text_content(entry)
+    thinking = extract_thinking_content(entry)
+    if not text and not thinking:
+        return None
+    return text, thinking
+
+
+def rank_tokens(labeled):
+    """Split extracted text into lowercase --rank words, skipping its [role] label."""
+    if not labeled:
+        return []
+    labeled = labeled.lower()
+    return RANK_TOKEN.findall(labeled, labeled.find('] ') + 1)
+
+
+def _delete_index_rows(conn, name, after_line=0):
+    """Remove a file's indexed entries past after_line."""
+    rows = conn.execute(
+        "SELECT id, line, text, thinking FROM entries WHERE name = ? AND line > ?",
+        (name, after_line)
+    ).fetchall()
+    for row_id, line_num, text, thinking in rows:
+        conn.execute(
+            "INSERT INTO entries_fts (entries_fts, rowid, body) VALUES ('delete', ?, ?)",
+            (row_id, _index_body(name, line_num, text, thinking))
+        )
+    conn.execute("DELETE FROM entries WHERE name = ? AND line > ?", (name, after_line))
+
+
+def _ingest_transcript(conn, filepath, stat, state):
+    """Index a transcript, resuming after previously indexed complete lines.
+
+    A trailing line without a newline is indexed provisionally and re-read on
+    the next update, since the session may still be writing it.
+    """
+    name = filepath.name
+    with open_transcript(filepath) as f:
+        offset, line_num = 0, 0
+        if state:
+            old_offset, old_lines, old_tail = state
+            if _can_resume(f, old_offset, old_tail):
+                offset, line_num = old_offset, old_lines
+        _delete_index_rows(conn, name, line_num)
+
+        lines = line_num
+        f.seek(offset)
+        for raw in f:
+            line_num += 1
+            if raw.endswith(b'\n'):
+                offset += len(raw)
+                lines = line_num
+            STATS['bytes read'] += len(raw)
+            STATS['lines decoded'] += 1
+            entry = decode_text_fields(raw)
+            texts = entry_texts(entry)
+            if texts is None:
                 continue
-            try:
-                entry = json.loads(line)
-                if should_include_entry(entry, args):
-                    formatted = format_entry(entry, line_num, filepath, args)
-                    if formatted:
-                        lines.append((line_num, formatted))
-            except json.JSONDecodeError:
+            text, thinking = texts
+            cursor = conn.execute(
+                "INSERT INTO entries (name, line, type, meta, text, thinking, tokens, thinking_tokens) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (name, line_num, entry['type'], int(bool(is_meta_message(entry))), text, thinking,
+                 len(rank_tokens(text)), len(rank_tokens(thinking)))
+            )
+            conn.execute(
+                "INSERT INTO entries_fts (rowid, body) VALUES (?, ?)",
+                (cursor.lastrowid, _index_body(name, line_num, text, thinking))
+            )
+        tail = _tail_checksum(f, offset)
+
+    conn.execute(
+        "INSERT OR REPLACE INTO files (name, size, mtime_ns, offset, lines, tail) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        (name, stat.st_size, stat.st_mtime_ns, offset, lines, tail)
+    )
+
+
+def update_index(conn):
+    """Bring the index up to date with new, appended and deleted transcripts."""
+    known = {
+        name: (size, mtime_ns, offset, lines, tail)
+        for name, size, mtime_ns, offset, lines, tail in conn.execute("SELECT * FROM files")
+    }
+    with conn:
+        for filepath in transcript_files():
+            stat = filepath.stat()
+            state = known.pop(filepath.name, None)
+            if state and state[:2] == (stat.st_size, stat.st_mtime_ns):
                 continue
-    return lines
+            STATS['files indexed'] += 1
+            _ingest_transcript(conn, filepath, stat, state and state[2:])
+        for name in known:
+            _delete_index_rows(conn, name)
+            conn.execute("DELETE FROM files WHERE name = ?", (name,))
+
+
+def _fts_query(need):
+    """Render a literal requirement tree as an FTS5 query."""
+    if isinstance(need, str):
+        return '"' + need.replace('"', '""') + '"'
+    op, children = need
+    return '(' + f' {op} '.join(_fts_query(child) for child in children) + ')'
+
+
+def _format_index_row(name, line_num, text, thinking, args):
+    """Format an indexed entry exactly as format_entry would in text-only mode."""
+    return format_text(text, thinking if args.include_thinking else None,
+                       line_num, TRANSCRIPT_DIR / name)
+
+
+def _index_lines(conn, name, args, span=(1, None)):
+    """Yield (line_num, formatted) for a file's filtered entries within span from the index."""
+    start, end = span
+    rows = conn.execute(
+        "SELECT line, type, meta, text, thinking FROM entries "
+        "WHERE name = ? AND line BETWEEN ? AND ? ORDER BY line",
+        (name, start, sys.maxsize if end is None else end)
+    )
+    for line_num, entry_type, meta, text, thinking in rows:
+        if not should_include_entry({'type': entry_type, 'isMeta': bool(meta)}, args):
+            continue
+        formatted = _format_index_row(name, line_num, text, thinking, args)
+        if formatted:
+            yield line_num, formatted
+
+
+def context_groups(lines, is_hit, context, limit):
+    """Group hits with their surrounding context in a single pass.
+
+    lines yields (line_num, formatted) in file order. Up to limit hits are
+    collected; windows of context lines around them are merged like
+    grep -C does when they overlap or touch. Yields lists of
+    (formatted, hit) pairs, keeping only the last context lines in memory
+    between groups.
+    """
+    before = deque(maxlen=context)
+    group = None
+    countdown = 0
+    hits = 0
+
+    for line_num, formatted in lines:
+        if hits < limit and is_hit(line_num, formatted):
+            hits += 1
+            if group is not None and not context:
+                yield group
+                group = None
+            if group is None:
+                group = []
+            group.extend(before)
+            before.clear()
+            group.append((formatted, True))
+            countdown = context
+        elif countdown:
+            group.append((formatted, False))
+            countdown -= 1
+        else:
+            if group is not None and (hits >= limit or len(before) == context):
+                yield group
+                group = None
+            if hits >= limit:
+                return
+            before.append((formatted, False))
+
+    if group is not None:
+        yield group
+
+
+def search_index(query, args, window, limit, context):
+    """Answer a text-only search from the full-text index.
+
+    The index narrows candidates to entries containing the query's required
+    literals; the regexes themselves still decide every match. Returns None
+    when the index can't be used, so the caller falls back to scanning.
+    """
+    need = prune_requirements(
+        query_requirements(query),
+        lambda literal: [literal] if len(literal) >= 3 else []
+    )
+    if need is None:
+        return None
+    conn = open_index()
+    if conn is None:
+        return None
+    with phase('index update'):
+        update_index(conn)
+    return _index_groups(conn, query, need, args, window, limit, context)
+
+
+def _index_groups(conn, query, need, args, window, limit, context):
+    """Yield context groups for index candidates, newest file first."""
+    try:
+        candidates = {}
+        with phase('index query'):
+            rows = conn.execute(
+                "SELECT e.name, e.line FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                "WHERE entries_fts MATCH ?",
+                (_fts_query(need),)
+            )
+            for name, line_num in rows:
+                candidates.setdefault(name, set()).add(line_num)
+        STATS['index candidates'] += sum(len(lines) for lines in candidates.values())
+
+        def is_hit(line_num, formatted):
+            return line_num in lines and query_hit(query, formatted)
+
+        for name in sorted(candidates, reverse=True):
+            span = session_span(TRANSCRIPT_DIR / name, window)
+            if span is None:
+                STATS['files outside --since/--until'] += 1
+                continue
+            STATS['files scanned'] += 1
+            lines = candidates[name]
+            if query['session']:
+                hits = session_hits(query, (
+                    (line_num, formatted, None)
+                    for line_num, formatted in _index_lines(conn, name, args, span)
+                    if line_num in lines
+                ), limit)
+                if not hits:
+                    continue
+                lines = hits
+                groups = context_groups(_index_lines(conn, name, args, span),
+                                        lambda line_num, formatted: line_num in lines,
+                                        context, limit)
+            else:
+                groups = context_groups(_index_lines(conn, name, args, span), is_hit, context, limit)
+            for group in groups:
+                limit -= sum(hit for _, hit in group)
+                yield group
+            if limit <= 0:
+                break
+    finally:
+        conn.close()
+
+
+def _read_line(f, offsets, line_num):
+    """Read raw line line_num using its line offsets, or b'' past the end."""
+    if line_num < len(offsets):
+        f.seek(offsets[line_num - 1])
+        line = f.read(offsets[line_num] - offsets[line_num - 1])
+    elif line_num == len(offsets):
+        f.seek(offsets[-1])
+        line = f.read()
+    else:
+        line = b''
+    STATS['bytes read'] += len(line)
+    return line
 
 
-def search_transcripts(pattern, args):
-    """Search all transcripts for pattern."""
+def _find_hits(filepath, query, prefilter, args, limit, span=(1, None)):
+    """Return {line_num: formatted} for up to limit hits among prefiltered lines."""
+    hits = {}
+    lines = read_transcript(filepath, args, *span, prefilter=prefilter)
+    for line_num, formatted in lines:
+        if query_hit(query, formatted):
+            hits[line_num] = formatted
+            if len(hits) >= limit:
+                break
+    lines.close()
+    return hits
+
+
+def _field_entries(filepath, query, args, span=(1, None), prefilter=None):
+    """Yield (line_num, formatted, entry) for the filtered entries of a transcript.
+
+    This is read_transcript for queries with field-scoped patterns: lines
+    are decoded with only the content item members those fields are read
+    from (plus, for text-only output, the text shown). Without --text-only
+    and unscoped patterns, formatted is None; hits are formatted later.
+    """
+    if args.text_only:
+        decode = entry_decoder(args, query['fields'])
+    elif query['unscoped']:
+        decode = decode_line
+    else:
+        decode = partial(decode_fields, keep=field_items(query['fields']))
+    for line_num, entry in iter_entries(filepath, *span, prefilter, decode=decode):
+        if not should_include_entry(entry, args):
+            continue
+        formatted = None
+        if args.text_only or query['unscoped']:
+            before = time.perf_counter()
+            formatted = format_entry(entry, line_num, filepath, args)
+            PHASES['formatting'] += time.perf_counter() - before
+            if not formatted:
+                continue
+        yield line_num, formatted, entry
+
+
+def _field_hits(filepath, query, args, limit, span=(1, None), prefilter=None):
+    """Return {line_num: formatted or None} for up to limit hits of a field-scoped query."""
+    lines = _field_entries(filepath, query, args, span, prefilter)
+    if query['session']:
+        hits = session_hits(query, lines, limit) or {}
+    else:
+        hits = {}
+        for line_num, formatted, entry in lines:
+            if query_hit(query, formatted, entry):
+                hits[line_num] = formatted
+                if len(hits) >= limit:
+                    break
+    lines.close()
+    return hits
+
+
+def _hit_groups(filepath, hits, args, context, span=(1, None)):
+    """Yield context groups for known hits, decoding only their context windows.
+
+    Each context window is read back through the line-offset sidecar,
+    walking outward from its hit (but not out of span) until enough included
+    lines are found; windows that overlap or touch are merged as in
+    context_groups. Hits given as None are formatted the same way.
+    """
+    if not hits:
+        return
+    if not context and None not in hits.values():
+        for formatted in hits.values():
+            yield [(formatted, True)]
+        return
+
+    with phase('line offsets'):
+        offsets = line_offsets(filepath)
+    decode = entry_decoder(args)
+    seen = {line_num: formatted for line_num, formatted in hits.items() if formatted is not None}
+    with open_transcript(filepath) as f:
+        first, last = span[0], len(offsets)
+        if span[1] is not None:
+            last = min(last, span[1])
+
+        def formatted_at(line_num):
+            if line_num not in seen:
+                STATS['lines decoded'] += 1
+                with phase('context re-reads'):
+                    entry = decode(_read_line(f, offsets, line_num))
+                    formatted = None
+                    if entry is not None and should_include_entry(entry, args):
+                        formatted = format_entry(entry, line_num, filepath, args)
+                seen[line_num] = formatted
+            return seen[line_num]
+
+        if not context:
+            for hit in hits:
+                yield [(formatted_at(hit), True)]
+            return
+
+        def included(line_nums, count):
+            return list(islice((ln for ln in line_nums if formatted_at(ln)), count))
+
+        windows = []
+        for hit in hits:
+            floor = windows[-1][1] + 1 if windows else first
+            if hit >= floor:
+                before = included(range(hit - 1, floor - 1, -1), context + 1)
+                if len(before) > context:
+                    windows.append([before[context - 1], hit])
+                elif windows:
+                    windows[-1][1] = hit
+                else:
+                    windows.append([first, hit])
+            after = included(range(hit + 1, last + 1), context)
+            windows[-1][1] = max(windows[-1][1], after[-1] if after else hit)
+
+        for start, end in windows:
+            yield [(formatted_at(ln), ln in hits)
+                   for ln in range(start, end + 1) if formatted_at(ln)]
+
+
+def search_file(filepath, query, args, context, limit, span=(1, None)):
+    """Return the context groups for up to limit hits in one transcript's span of lines.
+
+    When the query requires literal text, raw lines are screened for it
+    before any JSON decoding, and only hits' context windows are read back.
+    """
+    prefilter = raw_prefilter(raw_requirements(query_requirements(query), filepath, args), args)
+
+    if query['fields']:
+        hits = _field_hits(filepath, query, args, limit, span, prefilter)
+        return _hit_groups(filepath, hits, args, context, span)
+    if query['session']:
+        hits = session_hits(query, (
+            (line_num, formatted, None)
+            for line_num, formatted in read_transcript(filepath, args, *span, prefilter=prefilter)
+        ), limit)
+        return _hit_groups(filepath, hits or {}, args, context, span)
+    if prefilter is not None:
+        hits = _find_hits(filepath, query, prefilter, args, limit, span)
+        return _hit_groups(filepath, hits, args, context, span)
+    return context_groups(
+        read_transcript(filepath, args, *span),
+        lambda line_num, formatted: query_hit(query, formatted),
+        context, limit
+    )
+
+
+def _search_file_job(filepath, query, args, context, limit, span):
+    """Process-pool worker: search one transcript, returning its groups and stats."""
+    STATS.clear()
+    PHASES.clear()
+    groups = list(search_file(filepath, query, args, context, limit, span))
+    return groups, STATS, PHASES
+
+
+def _parallel_file_groups(files, query, args, context, limit, jobs):
+    """Search (filepath, span) pairs on a process pool, yielding (filepath, span, groups) in order.
+
+    At most two files per worker are queued ahead of the one being merged;
+    closing the generator cancels the files that have not started yet.
+    """
+    # Imported here, since most searches run on one process and never need it
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = deque()
+        try:
+            for filepath, span in files:
+                pending.append((filepath, span, pool.submit(
+                    _search_file_job, filepath, query, args, context, limit, span)))
+                if len(pending) >= jobs * 2:
+                    filepath, span, future = pending.popleft()
+                    yield filepath, span, _merge_job_stats(*future.result())
+            while pending:
+                filepath, span, future = pending.popleft()
+                yield filepath, span, _merge_job_stats(*future.result())
+        finally:
+            for *_, future in pending:
+                future.cancel()
+
+
+def _merge_job_stats(groups, stats, phases):
+    """Fold a worker's stats into this process's, returning its groups."""
+    STATS.update(stats)
+    PHASES.update(phases)
+    return groups
+
+
+def sessions_in_window(files, window):
+    """Yield (filepath, span) for the transcripts with lines inside a time window."""
+    for filepath in files:
+        span = session_span(filepath, window)
+        if span is None:
+            STATS['files outside --since/--until'] += 1
+        else:
+            yield filepath, span
+
+
+def scan_transcripts(query, args, window, limit, context):
+    """Search transcripts by reading every file in newest-first order."""
+    files = sessions_in_window(sorted(transcript_files(), reverse=True), window)
+
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count() or 1
+    if jobs > 1:
+        results = _parallel_file_groups(files, query, args, context, limit, jobs)
+    else:
+        results = ((filepath, span, None) for filepath, span in files)
+
+    for filepath, span, groups in results:
+        STATS['files scanned'] += 1
+        # Workers don't know how many hits earlier files used up; redo the
+        # file that crosses the limit so its last group ends where it should.
+        if groups is None or sum(hit for group in groups for _, hit in group) > limit:
+            groups = search_file(filepath, query, args, context, limit, span)
+        for group in groups:
+            limit -= sum(hit for _, hit in group)
+            yield group
+        if limit <= 0:
+            break
+
+
+def search_transcripts(query, args, store=None):
+    """Search all transcripts for a compiled query.
+
+    Each hit is printed with its context lines indented around it, in file
+    order; overlapping context windows are merged into one block. A
+    TranscriptStore, when given, answers text-only searches from memory.
+    """
     if not TRANSCRIPT_DIR.exists():
         print(f"No transcripts directory: {TRANSCRIPT_DIR}", file=sys.stderr)
         return
 
-    results = []
-    cutoff = None
-    if args.since:
-        cutoff = datetime.now() - parse_duration(args.since)
+    window = time_window(args)
+    limit = args.limit or DEFAULT_SEARCH_LIMIT
+    context = max(args.context or 0, 0)
+
+    groups = None
+    # Neither the index nor the store keeps tool calls and results, so
+    # field-scoped queries decode just their fields from the transcripts
+    if args.text_only and not query['fields']:
+        if store is not None:
+            groups = store.search(query, args, window, limit, context)
+        elif not args.no_index:
+            groups = search_index(query, args, window, limit, context)
+    if groups is None:
+        groups = scan_transcripts(query, args, window, limit, context)
+
+    if args.format == 'ndjson':
+        with RecordWriter() as writer:
+            for number, group in enumerate(groups):
+                with phase('output'):
+                    for formatted, hit in group:
+                        match = FORMATTED_PREFIX.match(formatted)
+                        spans = match_spans(query, formatted) if hit else ()
+                        writer.entry(match.group(1), int(match.group(2)), formatted, spans,
+                                     hit=hit, group=number)
+        return
+    for group in groups:
+        with phase('output'):
+            for formatted, hit in group:
+                print(formatted if hit else f"  {formatted}")
+            print()
+
+
+def _document_tokens(text, thinking, args):
+    """Return the --rank words of an entry as output would show it."""
+    tokens = rank_tokens(text)
+    if args.include_thinking:
+        tokens += rank_tokens(thinking)
+    return tokens
+
+
+def _bm25_top(docs, terms, args, window, k, count, total, df, tokens_for=None, keep=None):
+    """Score entries against terms with BM25, keeping the k best in a bounded heap.
+
+    docs yields (name, line, type, meta, text, thinking) rows; count, total
+    and df are the corpus's entry count, total words and per-term entry
+    counts. tokens_for(name, line), if given, supplies already tokenized
+    entries, and keep(name, line, text, thinking), if given, picks the
+    entries that may be scored (see _rank_filter). Returns (score, name,
+    -line, text, thinking) tuples, best first.
+    """
+    if not count:
+        return []
+    avgdl = total / count
+    idf = {term: math.log((count - df[term] + 0.5) / (df[term] + 0.5) + 1) for term in terms}
+    spans = {}
+    heap = []
+    for name, line_num, entry_type, meta, text, thinking in docs:
+        if name not in spans:
+            spans[name] = session_span(TRANSCRIPT_DIR / name, window)
+        span = spans[name]
+        if not _in_span(line_num, span):
+            continue
+        if not should_include_entry({'type': entry_type, 'isMeta': bool(meta)}, args):
+            continue
+        if keep and not keep(name, line_num, text, thinking):
+            continue
+        if tokens_for:
+            tokens = tokens_for(name, line_num)
+        else:
+            tokens = _document_tokens(text, thinking, args)
+        tf = Counter(token for token in tokens if token in idf)
+        if not tf:
+            continue
+        STATS['entries scored'] += 1
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avgdl)
+        score = sum(idf[term] * n * (BM25_K1 + 1) / (n + norm) for term, n in tf.items())
+        item = (score, name, -line_num, text, thinking)
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return sorted(heap, reverse=True)
+
+
+def _rank_filter(query, args):
+    """Return a keep check for _bm25_top applying --and and --not, or None if there are none.
+
+    The patterns are matched against each entry as --rank prints it.
+    """
+    if not (query['all_of'] or query['none_of']):
+        return None
 
-    for filepath in sorted(TRANSCRIPT_DIR.glob("*.jsonl"), reverse=True):
-        # Check date filter
-        if cutoff:
-            # Extract date from filename (YYYY-MM-DD-sessionid.jsonl)
-            try:
-                date_str = filepath.stem[:10]
-                file_date = datetime.strptime(date_str, "%Y-%m-%d")
-                if file_date < cutoff:
-                    continue
-            except ValueError:
-                pass
+    def keep(name, line_num, text, thinking):
+        formatted = _format_index_row(name, line_num, text, thinking, args)
+        STATS['regex evaluations'] += 1
+        return (all(_term_hit(term, formatted, None) for term in query['all_of'])
+                and not any(_term_hit(term, formatted, None) for term in query['none_of']))
+    return keep
 
-        lines = read_transcript(filepath, args)
 
-        for line_num, formatted in lines:
-            if re.search(pattern, formatted, re.IGNORECASE):
-                results.append((str(filepath), line_num, formatted))
+def _rank_index(terms, args, window, k, keep=None):
+    """Rank indexed entries, scoring only those the index says contain a term.
 
-                if len(results) >= (args.limit or DEFAULT_SEARCH_LIMIT):
-                    break
+    Returns None when the index can't be used.
+    """
+    conn = open_index()
+    if conn is None:
+        return None
+    with phase('index update'):
+        update_index(conn)
+    try:
+        length = "tokens + thinking_tokens" if args.include_thinking else "tokens"
+        count, total = conn.execute(
+            f"SELECT count(*), total({length}) FROM entries WHERE {length} > 0"
+        ).fetchone()
+
+        columns = "e.name, e.line, e.type, e.meta, e.text, e.thinking"
+        if all(len(term) >= 3 for term in terms):
+            query = (f"SELECT {columns} FROM entries_fts JOIN entries e ON e.id = entries_fts.rowid "
+                     "WHERE entries_fts MATCH ?")
+            params = (_fts_query(_any_of(terms)),)
+        else:
+            # Words shorter than a trigram can't be looked up
+            query, params = f"SELECT {columns} FROM entries e", ()
+
+        wanted = set(terms)
+        df = Counter()
+        with phase('rank statistics'):
+            for *_, text, thinking in conn.execute(query, params):
+                df.update(wanted.intersection(_document_tokens(text, thinking, args)))
+        with phase('rank scoring'):
+            return _bm25_top(conn.execute(query, params), terms, args, window, k, count, total, df,
+                             keep=keep)
+    finally:
+        conn.close()
+
+
+def _scan_documents(window=None):
+    """Yield (name, line, type, meta, text, thinking) for transcript entries with text.
+
+    With a time window, only entries within it are read.
+    """
+    files = sorted(transcript_files(), reverse=True)
+    for filepath, span in sessions_in_window(files, window):
+        STATS['files scanned'] += 1
+        for line_num, entry in iter_entries(filepath, *span, decode=decode_text_fields):
+            texts = entry_texts(entry)
+            if texts:
+                yield (filepath.name, line_num, entry['type'], is_meta_message(entry), *texts)
+
+
+def _rank_scan(terms, args, window, k, keep=None):
+    """Rank entries by reading the transcripts twice: once for corpus statistics, once to score."""
+    wanted = set(terms)
+    count = total = 0
+    df = Counter()
+    with phase('rank statistics'):
+        for *_, text, thinking in _scan_documents():
+            tokens = _document_tokens(text, thinking, args)
+            if tokens:
+                count += 1
+                total += len(tokens)
+                df.update(wanted.intersection(tokens))
+    with phase('rank scoring'):
+        return _bm25_top(_scan_documents(window), terms, args, window, k, count, total, df,
+                         keep=keep)
+
+
+def rank_transcripts(query, args, store=None):
+    """Print the entries most relevant to a compiled query's words, best first.
+
+    Entries are scored with BM25 over their extracted text across the whole
+    corpus; only the --limit best are kept while scoring. The --grep and
+    --grep-file patterns are the words, and only entries that match every
+    --and pattern and no --not pattern are scored.
+    """
+    if not TRANSCRIPT_DIR.exists():
+        print(f"No transcripts directory: {TRANSCRIPT_DIR}", file=sys.stderr)
+        return
 
-        if len(results) >= (args.limit or DEFAULT_SEARCH_LIMIT):
-            break
+    words = ' '.join(query['patterns'])
+    terms = list(dict.fromkeys(RANK_TOKEN.findall(words.lower())))
+    if not terms:
+        print(f"No words to rank by in: {words}", file=sys.stderr)
+        return
+    window = time_window(args)
+    k = args.limit or DEFAULT_SEARCH_LIMIT
+    keep = _rank_filter(query, args)
+
+    ranked = None
+    if store is not None:
+        ranked = store.rank(terms, args, window, k, keep)
+    elif not args.no_index:
+        ranked = _rank_index(terms, args, window, k, keep)
+    if ranked is None:
+        ranked = _rank_scan(terms, args, window, k, keep)
+
+    with phase('output'):
+        if args.format == 'ndjson':
+            with RecordWriter() as writer:
+                for score, name, neg_line, text, thinking in ranked:
+                    formatted = _format_index_row(name, -neg_line, text, thinking, args)
+                    # Words of the [role] label aren't ranked, so aren't marked
+                    label = formatted.find('] ', len(f"{TRANSCRIPT_DIR / name}:{-neg_line}: "))
+                    spans = [match.span() for match in RANK_TOKEN.finditer(formatted, label + 1)
+                             if match.group().lower() in terms]
+                    writer.entry(TRANSCRIPT_DIR / name, -neg_line, formatted, spans, score=score)
+            return
+        for score, name, neg_line, text, thinking in ranked:
+            print(_format_index_row(name, -neg_line, text, thinking, args))
+            print()
+
+
+def similarity_features(text):
+    """Count the --similar features of a message: its words and their character trigrams.
+
+    Features are hashed to 32-bit ids, so vectors built at different times
+    share one feature space without a stored vocabulary. Trigrams let
+    differently inflected or misspelled words still overlap.
+    """
+    counts = Counter()
+    for word in rank_tokens(text):
+        counts[zlib.crc32(word.encode())] += 1
+        padded = f" {word} ".encode()
+        for i in range(len(padded) - 2):
+            counts[zlib.crc32(padded[i:i + 3], 0x3)] += 1
+    return counts
+
+
+def similarity_vectors(filepath):
+    """Return (lines, ends, features, counts): a transcript's user messages as term counts.
+
+    Message k is line lines[k]; its features and their counts are
+    features[ends[k - 1]:ends[k]] and counts[ends[k - 1]:ends[k]]. Meta
+    messages are left out. The arrays are kept in a sidecar and extended
+    when the transcript grows. A trailing partial line is included but not
+    kept.
+    """
+    sidecar = _sidecar_path(filepath, "similar")
+    with open_transcript(filepath) as f:
+        start, known, (lines, ends, features, counts) = \
+            _load_sidecar(sidecar, SIMILAR_VERSION, f, 4)
+        offset, docs, terms = start, len(lines), len(features)
+        line_num = complete = known
+        f.seek(offset)
+        for raw in f:
+            line_num += 1
+            STATS['bytes read'] += len(raw)
+            STATS['lines decoded'] += 1
+            entry = decode_text_fields(raw, thinking=False)
+            if (isinstance(entry, dict) and entry.get('type') == 'user'
+                    and not is_meta_message(entry)):
+                vector = similarity_features(extract_text_content(entry))
+                if vector:
+                    lines.append(line_num)
+                    features.extend(vector.keys())
+                    counts.extend(vector.values())
+                    ends.append(len(features))
+            if raw.endswith(b'\n'):
+                offset += len(raw)
+                complete, docs, terms = line_num, len(lines), len(features)
+
+        if offset != start:
+            _update_sidecar(sidecar, SIMILAR_VERSION, f, offset, complete,
+                            [lines[:docs], ends[:docs], features[:terms], counts[:terms]])
+    return lines, ends, features, counts
+
+
+def _cosine_scores(query, ends, features, counts):
+    """Return each message's cosine similarity to query under TF-IDF weighting.
+
+    query maps features to counts; ends, features and counts describe all
+    messages as similarity_vectors does. Term frequencies are damped as
+    1 + log(tf) and weighted by smoothed IDF over these messages. The
+    whole corpus is scored in a few array operations when NumPy is
+    installed, and term by term otherwise.
+    """
+    n = len(ends)
+    if not n:
+        return []
+    # Imported here rather than at startup, since only --similar needs it
+    try:
+        import numpy
+    except ImportError:
+        numpy = None
+    if numpy is not None:
+        features = numpy.frombuffer(features, dtype=numpy.uint64)
+        tf = numpy.frombuffer(counts, dtype=numpy.uint64).astype(float)
+        sizes = numpy.diff(numpy.frombuffer(ends, dtype=numpy.uint64).astype(numpy.int64), prepend=0)
+        message = numpy.repeat(numpy.arange(n), sizes)
+        unique, inverse, df = numpy.unique(features, return_inverse=True, return_counts=True)
+        idf = numpy.log((n + 1) / (df + 1)) + 1
+        weights = (1 + numpy.log(tf)) * idf[inverse]
+        norms = numpy.sqrt(numpy.bincount(message, weights * weights, minlength=n))
+
+        wanted = numpy.fromiter(query.keys(), dtype=numpy.uint64, count=len(query))
+        pos = numpy.minimum(numpy.searchsorted(unique, wanted), len(unique) - 1)
+        seen = unique[pos] == wanted
+        query_idf = numpy.where(seen, idf[pos], math.log(n + 1) + 1)
+        query_tf = numpy.fromiter(query.values(), dtype=float, count=len(query))
+        query_weights = (1 + numpy.log(query_tf)) * query_idf
+        lookup = numpy.zeros(len(unique))
+        lookup[pos[seen]] = query_weights[seen]
+        dots = numpy.bincount(message, weights * lookup[inverse], minlength=n)
+        denominator = norms * numpy.sqrt(numpy.dot(query_weights, query_weights))
+        return numpy.divide(dots, denominator, out=numpy.zeros(n),
+                            where=denominator > 0).tolist()
+
+    df = Counter(features)
+    idf = {feature: math.log((n + 1) / (k + 1)) + 1 for feature, k in df.items()}
+    query_weights = {feature: (1 + math.log(tf)) * idf.get(feature, math.log(n + 1) + 1)
+                     for feature, tf in query.items()}
+    query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+    scores = []
+    start = 0
+    for end in ends:
+        dot = norm = 0.0
+        for feature, tf in zip(features[start:end], counts[start:end]):
+            weight = (1 + math.log(tf)) * idf[feature]
+            norm += weight * weight
+            if feature in query_weights:
+                dot += weight * query_weights[feature]
+        scores.append(dot / (math.sqrt(norm) * query_norm) if norm and query_norm else 0.0)
+        start = end
+    return scores
+
+
+def _message_line(filepath, line_num):
+    """Format one transcript line's entry as text-only output shows it."""
+    for _, entry in iter_entries(filepath, line_num, line_num,
+                                 decode=partial(decode_text_fields, thinking=False)):
+        return format_text(extract_text_content(entry), None, line_num, filepath)
+
+
+def similar_transcripts(text, args):
+    """Print the past user messages most similar to text, best first.
+
+    Every user message is compared with text by cosine similarity of TF-IDF
+    vectors over words and character trigrams, so rephrasings that share
+    few exact words still match. Per-transcript term counts are cached and
+    extended as sessions grow; IDF is recomputed over all messages at query
+    time. --since/--until limit which messages are shown.
+    """
+    if not TRANSCRIPT_DIR.exists():
+        print(f"No transcripts directory: {TRANSCRIPT_DIR}", file=sys.stderr)
+        return
 
-    # Output results with context
-    for filepath, line_num, formatted in results:
-        print(formatted)
+    query = similarity_features(f"[user] {text}")
+    if not query:
+        print(f"No words to compare in: {text}", file=sys.stderr)
+        return
+    window = time_window(args)
+    k = args.limit or DEFAULT_SEARCH_LIMIT
+
+    messages = []
+    ends, features, counts = array('Q'), array('Q'), array('Q')
+    with phase('similarity vectors'):
+        for filepath in sorted(transcript_files(), reverse=True):
+            STATS['files scanned'] += 1
+            lines, file_ends, file_features, file_counts = similarity_vectors(filepath)
+            base = len(features)
+            messages.extend((filepath, line_num) for line_num in lines)
+            ends.extend(base + end for end in file_ends)
+            features.extend(file_features)
+            counts.extend(file_counts)
+
+    with phase('similarity scoring'):
+        scores = _cosine_scores(query, ends, features, counts)
+        STATS['entries scored'] += len(scores)
+        spans = {}
+        best = []
+        for (filepath, line_num), score in zip(messages, scores):
+            if score <= 0:
+                continue
+            if filepath not in spans:
+                spans[filepath] = session_span(filepath, window)
+            if _in_span(line_num, spans[filepath]):
+                item = (score, filepath.name, -line_num, filepath)
+                if len(best) < k:
+                    heapq.heappush(best, item)
+                elif item > best[0]:
+                    heapq.heapreplace(best, item)
+
+    with phase('output'):
+        if args.format == 'ndjson':
+            with RecordWriter() as writer:
+                for score, _, neg_line, filepath in sorted(best, reverse=True):
+                    writer.entry(filepath, -neg_line, _message_line(filepath, -neg_line),
+                                 score=score)
+            return
+        for score, _, neg_line, filepath in sorted(best, reverse=True):
+            print(_message_line(filepath, -neg_line))
+            print()
+
+
+class TranscriptStore:
+    """The extracted text of every transcript entry, held in memory.
+
+    For each transcript the store keeps the text and thinking of its user and
+    assistant entries (never tool output), so text-only searches need no JSON
+    decoding or disk reads beyond a stat of each file. refresh() reads only
+    what was appended since the last call, re-reading a provisional trailing
+    line, and drops deleted transcripts. Callers sharing a store between
+    threads hold its lock.
+    """
+
+    def __init__(self, transcript_dir=TRANSCRIPT_DIR):
+        self.transcript_dir = Path(transcript_dir)
+        self.files = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Bring the store up to date with new, appended and deleted transcripts."""
+        present = set()
+        for filepath in transcript_files(self.transcript_dir):
+            present.add(filepath.name)
+            stat = filepath.stat()
+            record = self.files.get(filepath.name)
+            if record and (record['size'], record['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            STATS['files indexed'] += 1
+            self.files[filepath.name] = self._load(filepath, stat, record)
+        for name in set(self.files) - present:
+            del self.files[name]
+
+    def _load(self, filepath, stat, record):
+        """Read a transcript into a store record, resuming after complete lines."""
+        with open_transcript(filepath) as f:
+            if record and _can_resume(f, record['offset'], record['tail']):
+                entries = record['entries']
+                while entries and entries[-1][0] > record['lines']:
+                    entries.pop()
+                offset, line_num = record['offset'], record['lines']
+            else:
+                entries, offset, line_num = [], 0, 0
+
+            lines = line_num
+            f.seek(offset)
+            for raw in f:
+                line_num += 1
+                if raw.endswith(b'\n'):
+                    offset += len(raw)
+                    lines = line_num
+                STATS['bytes read'] += len(raw)
+                STATS['lines decoded'] += 1
+                entry = decode_text_fields(raw)
+                texts = entry_texts(entry)
+                if texts:
+                    text, thinking = texts
+                    folded = f"{text}\n{thinking}".lower()
+                    entries.append((line_num, entry['type'], bool(is_meta_message(entry)), text,
+                                    thinking, len(rank_tokens(text)), len(rank_tokens(thinking)),
+                                    folded))
+            tail = _tail_checksum(f, offset)
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'offset': offset,
+                'lines': lines, 'tail': tail, 'entries': entries}
+
+    def lines(self, name, args, need=None, span=(1, None)):
+        """Yield (line_num, formatted) for a transcript's filtered entries within span.
+
+        With a text requirement tree, entries that can't contain it are
+        skipped before formatting.
+        """
+        entries = self.files[name]['entries']
+        start = bisect.bisect_left(entries, (span[0],))
+        for line_num, entry_type, meta, text, thinking, _, _, folded in islice(entries, start, None):
+            if span[1] is not None and line_num > span[1]:
+                break
+            if need is not None and not text_candidate(need, folded):
+                continue
+            if should_include_entry({'type': entry_type, 'isMeta': meta}, args):
+                formatted = _format_index_row(name, line_num, text, thinking, args)
+                if formatted:
+                    yield line_num, formatted
+
+    def search(self, query, args, window, limit, context):
+        """Yield context groups for a text-only query, newest transcript first."""
+        self.refresh()
+        requirements = query_requirements(query)
+        for name in sorted(self.files, reverse=True):
+            span = session_span(self.transcript_dir / name, window, self.files[name]['mtime_ns'])
+            if span is None:
+                STATS['files outside --since/--until'] += 1
+                continue
+            STATS['files scanned'] += 1
+            need = text_requirements(requirements, TRANSCRIPT_DIR / name, args)
+            # Find the hits first when entries can be screened, then add context
+            hits = None
+            if query['session']:
+                hits = session_hits(query, (
+                    (line_num, formatted, None)
+                    for line_num, formatted in self.lines(name, args, need, span)
+                ), limit) or {}
+            elif need is not None:
+                hits = dict(islice(
+                    ((line_num, formatted)
+                     for line_num, formatted in self.lines(name, args, need, span)
+                     if query_hit(query, formatted)),
+                    limit
+                ))
+            if hits is not None and not hits:
+                continue
 
-        if args.context and args.context > 0:
-            # Read surrounding context
-            all_lines = read_transcript(filepath, args)
-            line_nums = [ln for ln, _ in all_lines]
+            def is_hit(line_num, formatted):
+                if hits is None:
+                    return query_hit(query, formatted)
+                return line_num in hits
 
-            try:
-                idx = line_nums.index(line_num)
-                start = max(0, idx - args.context)
-                end = min(len(all_lines), idx + args.context + 1)
-
-                for i in range(start, end):
-                    if i != idx:
-                        print(f"  {all_lines[i][1]}")
-            except ValueError:
-                pass
+            groups = context_groups(self.lines(name, args, span=span), is_hit, context, limit)
+            for group in groups:
+                limit -= sum(hit for _, hit in group)
+                yield group
+            if limit <= 0:
+                break
 
-        print()
+    def rank(self, terms, args, window, k, keep=None):
+        """Rank entries against terms as _rank_index does, from memory."""
+        self.refresh()
+        count = total = 0
+        candidates = []
+        tokenized = {}
+        wanted = set(terms)
+        df = Counter()
+        with phase('rank statistics'):
+            for name, record in self.files.items():
+                for line_num, entry_type, meta, text, thinking, tokens, thinking_tokens, folded \
+                        in record['entries']:
+                    length = tokens + thinking_tokens if args.include_thinking else tokens
+                    if not length:
+                        continue
+                    count += 1
+                    total += length
+                    if any(term in folded for term in terms):
+                        candidates.append((name, line_num, entry_type, meta, text, thinking))
+                        words = tokenized[name, line_num] = _document_tokens(text, thinking, args)
+                        df.update(wanted.intersection(words))
+        with phase('rank scoring'):
+            return _bm25_top(candidates, terms, args, window, k, count, total, df,
+                             tokens_for=lambda name, line_num: tokenized[name, line_num], keep=keep)
 
 
 def read_file_section(filepath, args):
-    """Read a section of a transcript file."""
+    """Read a section of a transcript file.
+
+    Returns the number of the last line shown if --limit may have cut the
+    section short, so following can pick up after it, or None.
+    """
     if not os.path.exists(filepath):
         print(f"File not found: {filepath}", file=sys.stderr)
         sys.exit(1)
 
-    lines = read_transcript(filepath, args)
-
+    # --since/--until narrow the lines read to the session's span within them
+    span = session_span(filepath, time_window(args))
+    if span is None:
+        return None
+    limit = None
     if args.lines:
         start, end = parse_line_range(args.lines)
-        lines = [(ln, fmt) for ln, fmt in lines if start <= ln <= end]
-    elif args.offset:
-        # Find lines starting at offset
-        start_idx = None
-        for i, (ln, _) in enumerate(lines):
-            if ln >= args.offset:
-                start_idx = i
-                break
-
-        if start_idx is not None:
-            limit = args.limit or DEFAULT_LIMIT
-            lines = lines[start_idx:start_idx + limit]
-        else:
-            lines = []
+        if span[1] is not None:
+            end = min(end, span[1])
+        lines = read_transcript(filepath, args, max(start, span[0]), end)
+    elif args.offset or args.from_offset is not None:
+        # Read from offset, stopping once the limit is reached
+        limit = args.limit or DEFAULT_LIMIT
+        start = args.offset
+        if args.from_offset is not None:
+            start = line_at_offset(filepath, args.from_offset)
+            if start is None:
+                print(f"No line starts at byte {args.from_offset} of {filepath}", file=sys.stderr)
+                sys.exit(1)
+        lines = islice(read_transcript(filepath, args, max(start, span[0]), span[1]), limit)
     else:
         # Default: first N lines
         limit = args.limit or DEFAULT_LIMIT
-        lines = lines[:limit]
+        lines = islice(read_transcript(filepath, args, *span), limit)
+
+    shown = 0
+    last = None
+    if args.format == 'ndjson':
+        with RecordWriter() as writer:
+            for last, formatted in lines:
+                writer.entry(filepath, last, formatted)
+                shown += 1
+    else:
+        for last, formatted in lines:
+            print(formatted)
+            shown += 1
+    return last if limit is not None and shown == limit else None
+
+
+def line_at_offset(filepath, offset):
+    """Return the number of the line that starts at a byte offset, or None if none does."""
+    offsets = line_offsets(filepath)
+    i = bisect.bisect_left(offsets, offset)
+    if i < len(offsets) and offsets[i] == offset:
+        return i + 1
+    return None
 
-    for line_num, formatted in lines:
-        print(formatted)
+
+def _newest_transcript():
+    """Return the transcript of the latest session, or None if there are none."""
+    files = list(TRANSCRIPT_DIR.glob("*.jsonl"))
+    if not files:
+        return None
+    return max(files, key=lambda filepath: (filepath.name[:10], filepath.stat().st_mtime_ns))
+
+
+def _complete_lines_within(filepath, size):
+    """Return (offset, line count) at the end of the last complete line in the first size bytes."""
+    offsets = line_offsets(filepath)
+    lines = bisect.bisect_right(offsets, size) - 1
+    return offsets[lines], lines
+
+
+def follow_transcript(filepath, args, query=None, newest=False, after=None):
+    """Print entries as they are appended to a transcript, until interrupted.
+
+    Following starts after the last complete line, or after line number
+    after if given, printing the lines between first. Each poll reads only the
+    bytes appended since the previous one, and a partially written final
+    line is held back until its newline arrives. With a query, only matching
+    entries are printed, each followed by a blank line as in search output.
+    With newest, following moves to whichever session is latest. Every
+    transcript is followed from where it stood when following began (or
+    from its start, if it appeared later), and from where following left
+    it when it becomes the latest again, so no entry is printed twice.
+    """
+    offsets = line_offsets(filepath)
+    line_num = len(offsets) - 1 if after is None else min(after, len(offsets) - 1)
+    offset = offsets[line_num]
+    pending = b''
+    # Sizes of the sessions that existed when following began, and where
+    # following stopped in the ones it has moved away from
+    started = {}
+    positions = {}
+    if newest:
+        for transcript in TRANSCRIPT_DIR.glob("*.jsonl"):
+            try:
+                started[transcript] = transcript.stat().st_size
+            except OSError:
+                pass
+    decode = entry_decoder(args, query['fields'] if query is not None else ())
+    writer = RecordWriter() if args.format == 'ndjson' else None
+    try:
+        while True:
+            if newest:
+                latest = _newest_transcript()
+                if latest is not None and latest != filepath:
+                    print(f"Following {latest}", file=sys.stderr)
+                    positions[filepath] = offset, line_num, pending
+                    filepath = latest
+                    if latest in positions:
+                        offset, line_num, pending = positions.pop(latest)
+                    elif latest in started:
+                        offset, line_num = _complete_lines_within(latest, started[latest])
+                        pending = b''
+                    else:
+                        offset, line_num, pending = 0, 0, b''
+            try:
+                size = os.path.getsize(filepath)
+            except OSError:
+                size = offset + len(pending)
+            if size < offset + len(pending):
+                print(f"{filepath} was rewritten; following from its start", file=sys.stderr)
+                offset, line_num, pending = 0, 0, b''
+            if size > offset + len(pending):
+                with open(filepath, 'rb') as f:
+                    f.seek(offset + len(pending))
+                    data = pending + f.read(size - offset - len(pending))
+                STATS['bytes read'] += len(data) - len(pending)
+                complete = data.rfind(b'\n') + 1
+                pending = data[complete:]
+                line_start = offset
+                offset += complete
+                for line in data[:complete].split(b'\n')[:-1]:
+                    line_num += 1
+                    start, line_start = line_start, line_start + len(line) + 1
+                    STATS['lines decoded'] += 1
+                    entry = decode(line)
+                    if entry is None or not should_include_entry(entry, args):
+                        continue
+                    formatted = format_entry(entry, line_num, filepath, args)
+                    if not formatted or (query is not None and not query_hit(query, formatted, entry)):
+                        continue
+                    if writer is not None:
+                        spans = match_spans(query, formatted) if query is not None else ()
+                        writer.located_entry(filepath, line_num, start, entry, formatted, spans)
+                    elif query is None:
+                        print(formatted, flush=True)
+                    else:
+                        print(f"{formatted}\n", flush=True)
+                if writer is not None:
+                    writer.flush()
+            time.sleep(FOLLOW_POLL_SECONDS)
+    except KeyboardInterrupt:
+        if writer is not None:
+            writer.flush()
+
+
+def follow_search(query, args):
+    """Print new entries of the latest session that match query, as they arrive."""
+    filepath = _newest_transcript()
+    if filepath is None:
+        print(f"No transcripts in {TRANSCRIPT_DIR}", file=sys.stderr)
+        return
+    print(f"Following {filepath}", file=sys.stderr)
+    follow_transcript(filepath, args, query, newest=True)
+
+
+def _tally_entry(info, entry):
+    """Fold one decoded entry into a session's manifest record."""
+    if not isinstance(entry, dict):
+        return
+    entry_type = str(entry.get('type'))
+    info['counts'][entry_type] = info['counts'].get(entry_type, 0) + 1
+
+    timestamp = entry.get('timestamp')
+    if isinstance(timestamp, str):
+        info['first_ts'] = min(info['first_ts'] or timestamp, timestamp)
+        info['last_ts'] = max(info['last_ts'] or timestamp, timestamp)
+
+    # First real user message as summary (skip meta/skill prompts)
+    if info['first'] is None and entry_type == 'user' and not is_meta_message(entry):
+        text = extract_text_content(entry)
+        if text:
+            info['first'] = text[:100] + "..." if len(text) > 100 else text
+
+
+def _summarize_transcript(filepath, stat, cached):
+    """Build or extend a session's manifest record.
+
+    Only complete lines are folded into the stored record, resuming after the
+    previous run's offset when the file was appended to. A trailing partial
+    line is reflected in the returned view but left for the next update.
+    Returns (stored, shown).
+    """
+    with open_transcript(filepath) as f:
+        if cached and _can_resume(f, cached['offset'], cached['tail']):
+            info = dict(cached, counts=dict(cached['counts']))
+        else:
+            info = {'offset': 0, 'counts': {}, 'first': None, 'first_ts': None, 'last_ts': None}
+
+        f.seek(info['offset'])
+        pending = None
+        for line in f:
+            STATS['bytes read'] += len(line)
+            STATS['lines decoded'] += 1
+            if not line.endswith(b'\n'):
+                pending = line
+                break
+            info['offset'] += len(line)
+            _tally_entry(info, decode_text_fields(line, thinking=False))
+        info['tail'] = _tail_checksum(f, info['offset'])
+
+    info.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, pending=pending is not None)
+    shown = info
+    if pending is not None:
+        shown = dict(info, counts=dict(info['counts']))
+        _tally_entry(shown, decode_text_fields(pending, thinking=False))
+    return info, shown
+
+
+def load_manifest():
+    """Return {filename: record} for all transcripts, updating the cached manifest.
+
+    Transcripts whose size and mtime match the cache are not opened; new,
+    appended and deleted ones are brought up to date and the manifest is
+    rewritten.
+    """
+    manifest_path = CACHE_DIR / "sessions.json"
+    try:
+        with open(manifest_path) as f:
+            cached = json.load(f)
+        if cached.get('version') != MANIFEST_VERSION:
+            cached = {}
+    except (OSError, ValueError):
+        cached = {}
+    stored = cached.get('sessions', {})
+
+    sessions = {}
+    updated = {}
+    for filepath in transcript_files():
+        stat = filepath.stat()
+        record = stored.get(filepath.name)
+        if (record and not record['pending']
+                and (record['size'], record['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)):
+            updated[filepath.name] = sessions[filepath.name] = record
+            continue
+        STATS['files scanned'] += 1
+        updated[filepath.name], sessions[filepath.name] = \
+            _summarize_transcript(filepath, stat, record)
+
+    if updated != stored:
+        try:
+            ensure_cache_dir()
+            tmp = manifest_path.with_suffix(f".tmp{os.getpid()}")
+            with open(tmp, 'w') as f:
+                json.dump({'version': MANIFEST_VERSION, 'sessions': updated}, f)
+            os.replace(tmp, manifest_path)
+        except OSError:
+            pass
+    return sessions
+
+
+def format_size(num_bytes):
+    """Format a byte count for humans (e.g. 1.2 MB)."""
+    for unit in ('B', 'KB', 'MB'):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == 'B' else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+
+def _manifest_in_window(info, window):
+    """Check whether a session's first-to-last timestamps overlap a time window."""
+    if window is None:
+        return True
+    first = timestamp_ms(info['first_ts'])
+    last = timestamp_ms(info['last_ts'])
+    if first is None or last is None:
+        return False
+    return ((window['since'] is None or last >= window['since'])
+            and (window['until'] is None or first < window['until']))
 
 
 def list_sessions(args):
-    """List all sessions with summaries."""
+    """List all sessions with summaries, from the cached session manifest."""
     if not TRANSCRIPT_DIR.exists():
         print(f"No transcripts directory: {TRANSCRIPT_DIR}", file=sys.stderr)
         return
 
-    for filepath in sorted(TRANSCRIPT_DIR.glob("*.jsonl"), reverse=True):
-        # Get first real user message as summary (skip meta/skill prompts)
-        summary = None
-        with open(filepath, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    entry = json.loads(line)
-                    if entry.get('type') == 'user' and not is_meta_message(entry):
-                        text = extract_text_content(entry)
-                        if text:
-                            summary = text[:100] + "..." if len(text) > 100 else text
-                            break
-                except json.JSONDecodeError:
-                    continue
-
+    window = time_window(args)
+
+    with phase('manifest'):
+        manifest = load_manifest()
+    sessions = []
+    for name, info in manifest.items():
+        if not _manifest_in_window(info, window):
+            STATS['files outside --since/--until'] += 1
+        elif sum(info['counts'].values()) >= (args.min_entries or 0):
+            sessions.append((name, info))
+    sort_keys = {
+        'date': lambda item: item[0],
+        'length': lambda item: sum(item[1]['counts'].values()),
+        'size': lambda item: item[1]['size'],
+    }
+    sessions.sort(key=sort_keys[args.sort], reverse=True)
+
+    if args.format == 'ndjson':
+        with RecordWriter() as writer:
+            for name, info in sessions:
+                filepath = TRANSCRIPT_DIR / name
+                stem = name[:-len(ARCHIVE_SUFFIX)] if is_archive(name) else filepath.stem
+                counts = info['counts']
+                writer.write({
+                    'path': str(filepath),
+                    'date': stem[:10],
+                    'session': stem[11:] if len(stem) > 10 else stem,
+                    'entries': sum(counts.values()),
+                    'counts': counts,
+                    'size': info['size'],
+                    'first_timestamp': info['first_ts'],
+                    'last_timestamp': info['last_ts'],
+                    'first': info['first'],
+                })
+        return
+    for name, info in sessions:
+        filepath = TRANSCRIPT_DIR / name
         date_str = filepath.stem[:10]
         session_id = filepath.stem[11:] if len(filepath.stem) > 10 else filepath.stem
+        counts = info['counts']
 
         print(f"{filepath}")
         print(f"  Date: {date_str}")
         print(f"  Session: {session_id[:8]}...")
-        if summary:
-            print(f"  First: {summary}")
+        print(f"  Entries: {sum(counts.values())} ({counts.get('user', 0)} user, "
+              f"{counts.get('assistant', 0)} assistant), {format_size(info['size'])}")
+        if info['first_ts']:
+            print(f"  Time: {info['first_ts']} to {info['last_ts']}")
+        if info['first']:
+            print(f"  First: {info['first']}")
         print()
 
 
-def main():
+class _ServerHandler(socketserver.StreamRequestHandler):
+    """Answer one forwarded invocation: a JSON line in, a JSON line out."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        with self.server.store.lock:
+            reply = _serve_request(self.server.store, request)
+        self.wfile.write(json.dumps(reply).encode() + b'\n')
+
+
+def _serve_request(store, request):
+    """Run a forwarded command line against the store, capturing its output.
+
+    Requests from another working directory get status None, so the client
+    runs them itself.
+    """
+    if request.get('cwd') != os.getcwd():
+        return {'status': None}
+    stdout, stderr = io.StringIO(), io.StringIO()
+    STATS.clear()
+    PHASES.clear()
+    status = 0
+    with redirect_stdout(stdout), redirect_stderr(stderr):
+        try:
+            main(request['argv'], store)
+        except SystemExit as exit:
+            status = exit.code if isinstance(exit.code, int) else int(exit.code is not None)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+    return {'status': status, 'stdout': stdout.getvalue(), 'stderr': stderr.getvalue()}
+
+
+def _watch_transcripts(store):
+    """Server thread: keep the store current between requests.
+
+    A refresh that fails, say on a transcript being archived or compacted
+    meanwhile, is reported and tried again on the next round.
+    """
+    while True:
+        time.sleep(SERVER_WATCH_SECONDS)
+        with store.lock:
+            try:
+                store.refresh()
+            except Exception:
+                # Requests redirect stderr only while they hold the lock
+                print("Refreshing transcripts failed; retrying", file=sys.stderr)
+                traceback.print_exc()
+
+
+def serve():
+    """Run the query server on SERVER_SOCKET until interrupted."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(SERVER_SOCKET))
+        print(f"A server is already listening on {SERVER_SOCKET}", file=sys.stderr)
+        sys.exit(1)
+    except OSError:
+        pass
+    ensure_cache_dir()
+    SERVER_SOCKET.unlink(missing_ok=True)
+
+    store = TranscriptStore()
+    store.refresh()
+    threading.Thread(target=_watch_transcripts, args=(store,), daemon=True).start()
+
+    server = socketserver.UnixStreamServer(str(SERVER_SOCKET), _ServerHandler)
+    server.store = store
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Serving {len(store.files)} transcripts on {SERVER_SOCKET}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        SERVER_SOCKET.unlink(missing_ok=True)
+
+
+def query_server(argv):
+    """Forward a command line to a running server.
+
+    Returns its reply ({status, stdout, stderr}), or None when no server is
+    listening or it declines, in which case the caller runs in-process.
+    """
+    if not SERVER_SOCKET.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(1)
+            sock.connect(str(SERVER_SOCKET))
+            sock.settimeout(None)
+            sock.sendall(json.dumps({'argv': argv, 'cwd': os.getcwd()}).encode() + b'\n')
+            with sock.makefile('rb') as reply:
+                reply = json.loads(reply.readline())
+    except (OSError, ValueError):
+        return None
+    return reply if reply.get('status') is not None else None
+
+
+def report_stats(elapsed, jobs):
+    """Print the work counters and phase timings on stderr."""
+    print("Stats:", file=sys.stderr)
+    for name in ('files scanned', 'files outside --since/--until', 'time index lookups',
+                 'files indexed', 'bytes read', 'archive bytes read', 'lines decoded',
+                 'lines prefiltered out', 'lines filtered', 'index candidates',
+                 'regex evaluations', 'entries scored', 'blobs loaded'):
+        value = STATS[name]
+        shown = f"{value} ({format_size(value)})" if name.endswith('bytes read') else value
+        print(f"  {name}: {shown}", file=sys.stderr)
+    print("Time:" if jobs == 1 else "Time (summed over worker processes):", file=sys.stderr)
+    for name, seconds in PHASES.items():
+        print(f"  {name}: {seconds:.3f}s", file=sys.stderr)
+    print(f"  total: {elapsed:.3f}s", file=sys.stderr)
+
+
+def main(argv=None, store=None):
+    if argv is None:
+        argv = sys.argv[1:]
+        if not {'--serve', '--no-server', '--follow'}.intersection(argv):
+            reply = query_server(argv)
+            if reply is not None:
+                sys.stdout.write(reply['stdout'])
+                sys.stdout.flush()
+                sys.stderr.write(reply['stderr'])
+                sys.exit(reply['status'])
+
     parser = argparse.ArgumentParser(
         description="Search and read SICP tutoring session transcripts"
     )
@@ -312,14 +3147,40 @@ def main():
                         help="Include meta messages (skill prompts, injected context)")
 
     # Search mode
-    parser.add_argument('--grep', metavar='PATTERN',
-                        help="Search for pattern in transcripts")
-    parser.add_argument('--since', metavar='DURATION',
-                        help="Filter to recent sessions (e.g., 7d, 2w)")
+    parser.add_argument('--grep', metavar='PATTERN', action='append',
+                        help="Search for pattern in transcripts (repeat to match any of several); "
+                             "a role:, text:, thinking:, tool:, tool_result: or meta: prefix "
+                             "matches only that field of each entry (e.g., tool:Bash), and "
+                             "--text-only output then includes that field's content")
+    parser.add_argument('--grep-file', metavar='PATH',
+                        help="Also match any pattern listed in PATH, one per line")
+    parser.add_argument('--and', dest='and_patterns', metavar='PATTERN', action='append',
+                        help="Also require this pattern to match (repeatable)")
+    parser.add_argument('--not', dest='not_patterns', metavar='PATTERN', action='append',
+                        help="Exclude matches of this pattern (repeatable)")
+    parser.add_argument('--scope', choices=('entry', 'session'), default='entry',
+                        help="Apply --grep/--and/--not to each entry, or across each session "
+                             "(default: entry)")
+    parser.add_argument('--since', metavar='TIME',
+                        help="Only entries from TIME on: a duration ago (e.g., 3h, 7d, 2w) or a "
+                             "local date or time (e.g., 2026-03-01, 2026-03-01T14:30); also "
+                             "applies to --list and --file")
+    parser.add_argument('--until', metavar='TIME',
+                        help="Only entries before TIME, given as for --since")
     parser.add_argument('--context', '-C', type=int, default=DEFAULT_CONTEXT,
                         help=f"Lines of context around matches (default: {DEFAULT_CONTEXT})")
     parser.add_argument('--limit', '-n', type=int,
                         help=f"Max results (default: {DEFAULT_SEARCH_LIMIT} for search, {DEFAULT_LIMIT} for read)")
+    parser.add_argument('--rank', action='store_true',
+                        help="Treat --grep as words and show the --limit most relevant "
+                             "entries (BM25) that pass --and and --not, as text")
+    parser.add_argument('--similar', metavar='TEXT',
+                        help="Show the --limit past user messages closest to TEXT in wording "
+                             "(TF-IDF cosine similarity), as text")
+    parser.add_argument('--no-index', action='store_true',
+                        help="Scan transcripts instead of using the search index")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="Scan transcripts on N worker processes (0: one per CPU)")
 
     # Read mode
     parser.add_argument('--file', metavar='PATH',
@@ -328,27 +3189,124 @@ def main():
                         help="Read specific line range (e.g., 40-60)")
     parser.add_argument('--offset', type=int,
                         help="Start reading at line N")
+    parser.add_argument('--from-offset', type=int, metavar='BYTES',
+                        help="Start reading at the line beginning at this byte offset, as given "
+                             "by --format ndjson")
+    parser.add_argument('--follow', action='store_true',
+                        help="Keep printing new entries as the transcript (or, with --grep, "
+                             "the latest session) grows")
+
+    # Output
+    parser.add_argument('--format', choices=('text', 'ndjson'), default='text',
+                        help="Print file:line: text lines, or one JSON record per entry (path, "
+                             "line, byte offset, type, role, timestamp, text, match spans) or "
+                             "session (default: text)")
 
     # Browsing
     parser.add_argument('--list', action='store_true',
                         help="List sessions with summaries")
-
-    args = parser.parse_args()
+    parser.add_argument('--sort', choices=('date', 'length', 'size'), default='date',
+                        help="Order sessions for --list (default: date, newest first)")
+    parser.add_argument('--min-entries', type=int, metavar='N',
+                        help="Only list sessions with at least N entries")
+
+    # Maintenance
+    parser.add_argument('--compact', action='store_true',
+                        help=f"Move large meta messages (skill prompts) of idle transcripts into "
+                             f"{BLOB_DIR}/, stored once per distinct content")
+    parser.add_argument('--archive', metavar='DURATION',
+                        help=f"Compress sessions older than DURATION (e.g., 30d) into "
+                             f"*{ARCHIVE_SUFFIX} block archives, which are still searched and read")
+
+    # Diagnostics
+    parser.add_argument('--stats', action='store_true',
+                        help="Report files, bytes, lines and regex work and per-phase time on stderr")
+    parser.add_argument('--profile', metavar='PATH',
+                        help="Write a cProfile dump of this process to PATH (view with pstats)")
+
+    # Query server
+    parser.add_argument('--serve', action='store_true',
+                        help=f"Run a warm query server on {SERVER_SOCKET} until interrupted")
+    parser.add_argument('--no-server', action='store_true',
+                        help="Run in-process even if a query server is running")
+
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        if store is not None:
+            parser.error("--serve can't be forwarded to a running server")
+        serve()
+        return
 
     # Validate mutually exclusive options
     if args.user_only and args.assistant_only:
         parser.error("Cannot use both --user-only and --assistant-only")
 
+    searching = bool(args.grep or args.grep_file)
+    if (args.and_patterns or args.not_patterns) and not searching:
+        parser.error("--and and --not need a --grep or --grep-file pattern")
+
+    if not (args.list or searching or args.similar or args.file or args.archive or args.compact):
+        parser.print_help()
+        sys.exit(1)
+    try:
+        time_window(args)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.from_offset is not None and (not args.file or args.lines or args.offset):
+        parser.error("--from-offset reads a --file, instead of --lines or --offset")
+    if args.follow:
+        if store is not None:
+            parser.error("--follow can't be forwarded to a running server")
+        if args.file and is_archive(args.file):
+            parser.error("archived transcripts don't grow; --follow needs a live transcript")
+        if args.list or args.rank or args.similar or args.scope == 'session':
+            parser.error("--follow works with --file, or --grep on single entries")
+
+    if args.rank and args.scope == 'session':
+        parser.error("--rank scores single entries; --scope session needs a plain --grep search")
+    query = compile_query(args) if searching else None
+    args.include_tools = ()
+    if query is not None and query['fields']:
+        if args.rank:
+            parser.error("--rank takes words; field-scoped patterns need a plain --grep search")
+        # Entries found by their thinking, meta text or tool content are shown with it
+        positive = {field for field, _ in query['any_of'] + query['all_of']}
+        args.include_thinking = args.include_thinking or 'thinking' in positive
+        args.include_meta = args.include_meta or 'meta' in positive
+        args.include_tools = tuple(field for field in ('tool', 'tool_result') if field in positive)
+
+    profiler = cProfile.Profile() if args.profile else None
+    if profiler:
+        profiler.enable()
+    start = time.perf_counter()
+
     # Execute appropriate mode
-    if args.list:
+    if args.compact:
+        compact_sessions(args)
+    elif args.archive:
+        archive_sessions(args)
+    elif args.list:
         list_sessions(args)
-    elif args.grep:
-        search_transcripts(args.grep, args)
-    elif args.file:
-        read_file_section(args.file, args)
+    elif args.similar:
+        similar_transcripts(args.similar, args)
+    elif searching and args.rank:
+        rank_transcripts(query, args, store)
+    elif searching and args.follow:
+        follow_search(query, args)
+    elif searching:
+        search_transcripts(query, args, store)
     else:
-        parser.print_help()
-        sys.exit(1)
+        stopped = read_file_section(args.file, args)
+        if args.follow:
+            follow_transcript(args.file, args, after=stopped)
+
+    if profiler:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+    if args.stats:
+        sys.stdout.flush()
+        report_stats(time.perf_counter() - start, args.jobs if searching else 1)
 
 
 if __name__ == "__main__":
@@ -1,41 +1,258 @@
 #!/usr/bin/env python3
 """SICP Tutoring Environment Setup Script"""
 
+import hashlib
 import json
 import os
 import subprocess
 import sys
 import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).parent.resolve()
 PROJECT_DIR = SCRIPT_DIR.parent
 MARKERS_DIR = PROJECT_DIR / ".setup-markers"
 
+# The toolchain probe is cached here while the tools' binaries stay the same
+TOOLCHAIN_CACHE = MARKERS_DIR / "toolchain.json"
+TOOLCHAIN_VERSION = 2
+TOOLS = ("git", "pandoc", "curl", "unzip", "racket", "raco", "drracket")
+# One racket start reports its version, docs and package directories, and
+# the sicp package
+RACKET_PROBE = (
+    '(require setup/dirs)'
+    ' (printf "version ~a\\n" (version))'
+    ' (printf "docs ~a\\n" (let ([dir (find-doc-dir)]) (if dir (path->string dir) "")))'
+    ' (printf "pkgs ~a\\n" (path->string (find-pkgs-dir)))'
+    ' (printf "user-pkgs ~a\\n" (path->string (find-user-pkgs-dir)))'
+    ' (printf "sicp ~a\\n" (with-handlers ([exn:fail? (lambda (e) #f)])'
+    ' (dynamic-require (quote sicp) #f) #t))'
+)
+
+# The setup phase running on the current thread, and where its progress goes
+phase_output = threading.local()
+# The toolchain probe for this run, once made or loaded
+toolchain_lock = threading.Lock()
+toolchain_probe = None
+
+
+class PhaseOutput:
+    """Progress of concurrently running setup phases, printed in PHASES order.
+
+    The earliest unfinished phase is live: its lines are printed as they
+    come. Later phases' lines are held back until every phase before them
+    has finished, then printed, and the next unfinished phase goes live.
+    """
+
+    def __init__(self, names):
+        self.lock = threading.Lock()
+        self.names = names
+        self.held = {name: [] for name in names}
+        self.finished = set()
+        self.shown = 0
+
+    def live(self, name):
+        """Check if name is the phase whose progress is printed as it comes."""
+        with self.lock:
+            return self._live(name)
+
+    def _live(self, name):
+        return self.shown < len(self.names) and self.names[self.shown] == name
+
+    def say(self, name, line):
+        """Print a phase's progress line, or hold it back until the phase is live."""
+        with self.lock:
+            if self._live(name):
+                print(line, flush=True)
+            else:
+                self.held[name].append(line)
+
+    def finish(self, name, *lines):
+        """Record a phase as finished with any last lines, and print what can now be shown."""
+        with self.lock:
+            self.held[name].extend(lines)
+            self.finished.add(name)
+            while self.shown < len(self.names):
+                current = self.names[self.shown]
+                for line in self.held[current]:
+                    print(line)
+                self.held[current] = []
+                if current not in self.finished:
+                    break
+                self.shown += 1
+            sys.stdout.flush()
+
+
+def say(line=""):
+    """Print a progress line, held back while an earlier setup phase is still running."""
+    name = getattr(phase_output, 'name', None)
+    if name is None:
+        print(line)
+    else:
+        phase_output.progress.say(name, line)
+
 
 def run(cmd, check=True, capture=False, **kwargs):
-    """Run a shell command."""
+    """Run a shell command.
+
+    Inside a setup phase that isn't live yet, the command's output is read
+    line by line as progress of the phase, held back until it goes live,
+    instead of going straight to the terminal.
+    """
     if capture:
         result = subprocess.run(cmd, shell=True, capture_output=True, text=True, **kwargs)
         return result
-    else:
+    name = getattr(phase_output, 'name', None)
+    if name is None or phase_output.progress.live(name):
         return subprocess.run(cmd, shell=True, check=check, **kwargs)
+    # Python scripts would otherwise buffer their progress until they exit
+    kwargs.setdefault("env", {**os.environ, "PYTHONUNBUFFERED": "1"})
+    with subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                          text=True, **kwargs) as process:
+        for line in process.stdout:
+            say(line.rstrip("\n"))
+    if check and process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, cmd)
+    return subprocess.CompletedProcess(cmd, process.returncode)
 
 
 def command_exists(cmd):
     """Check if a command exists."""
-    return shutil.which(cmd) is not None
-
-
-def marker_exists(name):
-    """Check if a setup marker exists."""
-    return (MARKERS_DIR / name).exists()
-
-
-def create_marker(name):
-    """Create a setup marker."""
-    MARKERS_DIR.mkdir(parents=True, exist_ok=True)
-    (MARKERS_DIR / name).touch()
+    return toolchain()["tools"].get(cmd) is not None
+
+
+def read_marker(name):
+    """Return a setup marker's record, {} for an empty marker, or None if there is none."""
+    try:
+        text = (MARKERS_DIR / name).read_text()
+    except OSError:
+        return None
+    if not text.strip():
+        return {}
+    try:
+        record = json.loads(text)
+    except ValueError:
+        return None
+    return record if isinstance(record, dict) else None
+
+
+def marker_current(name, fingerprint, repair_mode):
+    """Check if a setup marker exists and still records fingerprint.
+
+    Fingerprints are recomputed on every run, repair mode included, and
+    cover each phase's outputs as well as its inputs, so a phase whose work
+    changed or went missing runs again. Empty markers, from before markers
+    were fingerprinted, are trusted except in repair mode.
+    """
+    record = read_marker(name)
+    if record is None:
+        return False
+    if "fingerprint" not in record:
+        return not repair_mode
+    # Compare as stored, since JSON turns tuples into lists
+    return record["fingerprint"] == json.loads(json.dumps(fingerprint))
+
+
+def create_marker(name, fingerprint=None, **details):
+    """Create a setup marker recording the phase's fingerprint and any details."""
+    write_json(MARKERS_DIR / name, {"fingerprint": fingerprint, **details})
+
+
+def file_identity(path):
+    """Identify a file by its resolved path, size and mtime, or None if it's missing."""
+    if path is None:
+        return None
+    path = os.path.realpath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [path, stat.st_size, stat.st_mtime_ns]
+
+
+def files_digest(paths):
+    """Hash the names (relative to the project) and contents of files."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(str(Path(path).relative_to(PROJECT_DIR)).encode() + b"\0")
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def write_json(path, value):
+    """Write value to a JSON file atomically, so readers never see half of it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f".{path.name}.tmp")
+    temp.write_text(json.dumps(value, indent=2) + "\n")
+    os.replace(temp, path)
+
+
+def probe_racket():
+    """Ask racket, once, for its version, docs and package directories, and whether sicp is installed."""
+    result = run(f"racket -e '{RACKET_PROBE}'", check=False, capture=True)
+    found = dict(line.split(" ", 1) for line in result.stdout.splitlines() if " " in line)
+    return {
+        "version": found.get("version"),
+        "docs_dir": found.get("docs") or None,
+        "pkgs_dirs": [found[scope] for scope in ("pkgs", "user-pkgs") if found.get(scope)],
+        "sicp": found.get("sicp") == "#t",
+    }
+
+
+def probe_pandoc():
+    """Return pandoc's version, e.g. "3.1.9"."""
+    result = run("pandoc --version", check=False, capture=True)
+    words = result.stdout.split()
+    return {"version": words[1] if result.returncode == 0 and len(words) > 1 else None}
+
+
+def toolchain(refresh=False):
+    """Return the toolchain probe that setup phases share.
+
+    It records each tool's binary (path, size and mtime, or None if it's
+    not installed), pandoc's version, and what probe_racket reports. The
+    probe is cached in TOOLCHAIN_CACHE and reused for as long as the
+    binaries are the same; refresh makes a new one, e.g. after installing
+    a Racket package.
+    """
+    global toolchain_probe
+    with toolchain_lock:
+        if toolchain_probe is not None and not refresh:
+            return toolchain_probe
+        tools = {tool: file_identity(shutil.which(tool)) for tool in TOOLS}
+        probe = None
+        if not refresh:
+            try:
+                probe = json.loads(TOOLCHAIN_CACHE.read_text())
+            except (OSError, ValueError):
+                pass
+            if (not isinstance(probe, dict) or probe.get("version") != TOOLCHAIN_VERSION
+                    or probe.get("tools") != json.loads(json.dumps(tools))):
+                probe = None
+        if probe is None:
+            probe = {
+                "version": TOOLCHAIN_VERSION,
+                "tools": tools,
+                "racket": probe_racket() if tools["racket"] else None,
+                "pandoc": probe_pandoc() if tools["pandoc"] else None,
+            }
+            write_json(TOOLCHAIN_CACHE, probe)
+        toolchain_probe = probe
+        return probe
+
+
+def git_commit(repo, rev="HEAD"):
+    """Resolve rev in a git repository, or None if it can't be."""
+    result = run(f"git -C '{repo}' rev-parse --verify --quiet '{rev}'", check=False, capture=True)
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip() or None
 
 
 def check_dependencies():
@@ -64,82 +281,152 @@ def check_dependencies():
         sys.exit(1)
 
 
+def sicp_fingerprint(probe):
+    """Fingerprint the SICP package: the racket binary, and the package's directory in each scope."""
+    return {
+        "racket": probe["tools"]["racket"],
+        "package": [file_identity(os.path.join(pkgs_dir, "sicp"))
+                    for pkgs_dir in probe["racket"]["pkgs_dirs"]],
+    }
+
+
 def setup_racket_sicp(repair_mode):
-    """Check/install SICP Racket package."""
+    """Check/install SICP Racket package.
+
+    The marker is fingerprinted with the racket binary and the package's
+    installed directory, so upgrading Racket or removing or reinstalling
+    the package makes setup check for it again.
+    """
     marker = "racket-sicp"
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ SICP package installed")
+    if marker_current(marker, sicp_fingerprint(toolchain()), repair_mode):
+        say("✓ SICP package installed")
         return
 
-    # Check if already installed
-    result = run("racket -e '(require sicp)'", check=False, capture=True)
-    if result.returncode == 0:
-        create_marker(marker)
-        print("✓ SICP package installed")
+    # Check if already installed; the cached probe may predate a removal or install
+    probe = toolchain(refresh=True)
+    if probe["racket"]["sicp"]:
+        create_marker(marker, sicp_fingerprint(probe), racket_version=probe["racket"]["version"])
+        say("✓ SICP package installed")
         return
 
-    print("Installing SICP package...")
+    say("Installing SICP package...")
     run("raco pkg install --auto --scope installation sicp")
-    create_marker(marker)
+    probe = toolchain(refresh=True)
+    create_marker(marker, sicp_fingerprint(probe), racket_version=probe["racket"]["version"])
+
+
+def submodule_fingerprint():
+    """Fingerprint the book submodule: the commit the project pins, and the one checked out.
+
+    A book that is present but not a git checkout (say, copied in) counts
+    as checked out at whatever the project pins.
+    """
+    source_dir = PROJECT_DIR / "book/sicp-source"
+    checked_out = None
+    if (source_dir / "html/index.xhtml").exists():
+        checked_out = "present"
+        if (source_dir / ".git").exists():
+            checked_out = git_commit(source_dir) or checked_out
+    return {
+        "pinned": git_commit(PROJECT_DIR, "HEAD:book/sicp-source"),
+        "checked_out": checked_out,
+    }
 
 
 def setup_submodule(repair_mode):
-    """Initialize the book submodule."""
+    """Initialize the book submodule, or update it when the project pins a new commit."""
     marker = "submodule"
-    book_index = PROJECT_DIR / "book/sicp-source/html/index.xhtml"
+    fingerprint = submodule_fingerprint()
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ Book submodule present")
+    if marker_current(marker, fingerprint, repair_mode):
+        say("✓ Book submodule present")
         return
 
-    if book_index.exists():
-        create_marker(marker)
-        print("✓ Book submodule present")
+    checked_out = fingerprint["checked_out"]
+    if checked_out and (fingerprint["pinned"] in (None, checked_out) or checked_out == "present"):
+        create_marker(marker, fingerprint)
+        say("✓ Book submodule present")
         return
 
-    print("Initializing SICP book submodule...")
+    say("Updating SICP book submodule..." if checked_out else "Initializing SICP book submodule...")
     run(f"git -C '{PROJECT_DIR}' submodule update --init --depth 1 book/sicp-source")
-    create_marker(marker)
-    print("✓ Book submodule initialized")
+    create_marker(marker, submodule_fingerprint())
+    say("✓ Book submodule initialized")
+
+
+def book_fingerprint():
+    """Fingerprint book processing by the contents of its inputs and of its outputs."""
+    source_dir = PROJECT_DIR / "book/sicp-source/html"
+    text_dir = PROJECT_DIR / "book/text"
+    inputs = list(source_dir.glob("*.xhtml")) + [PROJECT_DIR / "scripts/process-book.py"]
+    outputs = [path for path in text_dir.glob("*") if path.is_file()]
+    return {"inputs": files_digest(inputs), "outputs": files_digest(outputs)}
 
 
 def setup_book_processing(repair_mode):
-    """Process book to markdown."""
+    """Process book to markdown, again whenever the sources or outputs change."""
     marker = "book-processed"
     text_dir = PROJECT_DIR / "book/text"
+    fingerprint = book_fingerprint()
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ Book already processed")
+    if marker_current(marker, fingerprint, repair_mode):
+        say("✓ Book already processed")
         return
 
-    if text_dir.exists() and any(text_dir.iterdir()):
-        create_marker(marker)
-        print("✓ Book already processed")
+    # Adopt existing output unless a fingerprint shows it's out of date
+    record = read_marker(marker)
+    if (not record or "fingerprint" not in record) and text_dir.exists() and any(text_dir.iterdir()):
+        create_marker(marker, fingerprint)
+        say("✓ Book already processed")
         return
 
-    print("Processing book to markdown...")
-    run(f"'{PROJECT_DIR}/scripts/process-book.sh'")
-    create_marker(marker)
+    say("Processing book to markdown...")
+    run(f"'{PROJECT_DIR}/scripts/process-book.py'")
+    create_marker(marker, book_fingerprint())
     (MARKERS_DIR / "tutor-verify-book").touch()
-    print("✓ Book processed to markdown")
+    say("✓ Book processed to markdown")
+
+
+def book_index_fingerprint():
+    """Fingerprint the lookup index by the contents of the files it indexes, and its own."""
+    patterns = ("book/text/*.md", "book/code/*.scm.html", "book/psets/*/readme.html")
+    sources = [path for pattern in patterns for path in PROJECT_DIR.glob(pattern)]
+    index = PROJECT_DIR / "book/lookup.json"
+    return {"sources": files_digest(sources + [PROJECT_DIR / "scripts/book-lookup.py"]),
+            "index": files_digest([index]) if index.exists() else None}
+
+
+def setup_book_index(repair_mode):
+    """Index exercises, sections, figures and problem sets, again whenever their files change."""
+    marker = "book-indexed"
+
+    if marker_current(marker, book_index_fingerprint(), repair_mode):
+        say("✓ Book lookup index up to date")
+        return
+
+    say("Indexing book, code and problem sets...")
+    run(f"'{PROJECT_DIR}/scripts/book-lookup.py' --build")
+    create_marker(marker, book_index_fingerprint())
+    say("✓ Book lookup index built")
 
 
 def setup_tutor_workspace(repair_mode):
     """Initialize the .tutor/ workspace."""
     marker = "tutor-workspace"
     tutor_dir = PROJECT_DIR / ".tutor"
+    fingerprint = {"git": (tutor_dir / ".git").exists()}
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ .tutor/ git initialized")
+    if marker_current(marker, fingerprint, repair_mode):
+        say("✓ .tutor/ git initialized")
         return
 
-    if (tutor_dir / ".git").exists():
-        create_marker(marker)
-        print("✓ .tutor/ git initialized")
+    if fingerprint["git"]:
+        create_marker(marker, fingerprint)
+        say("✓ .tutor/ git initialized")
         return
 
-    print("Initializing tutor workspace...")
+    say("Initializing tutor workspace...")
 
     # Create directories
     (tutor_dir / "knowledge/sessions").mkdir(parents=True, exist_ok=True)
@@ -206,8 +493,8 @@ Track patterns of confusion that recur across sessions.
 
     # Initialize git repo
     run(f"cd '{tutor_dir}' && git init && git add -A && git commit -m 'Initial tutor workspace'")
-    create_marker(marker)
-    print("✓ .tutor/ git initialized")
+    create_marker(marker, {"git": True})
+    say("✓ .tutor/ git initialized")
 
 
 def setup_work_workspace(repair_mode):
@@ -215,20 +502,21 @@ def setup_work_workspace(repair_mode):
     marker = "work-workspace"
     work_dir = PROJECT_DIR / "work"
     work_dir.mkdir(exist_ok=True)
+    fingerprint = {"git": (work_dir / ".git").exists()}
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ work/ git initialized")
+    if marker_current(marker, fingerprint, repair_mode):
+        say("✓ work/ git initialized")
         return
 
-    if (work_dir / ".git").exists():
-        create_marker(marker)
-        print("✓ work/ git initialized")
+    if fingerprint["git"]:
+        create_marker(marker, fingerprint)
+        say("✓ work/ git initialized")
         return
 
     (work_dir / ".gitkeep").touch()
     run(f"cd '{work_dir}' && git init && git add -A && git commit -m 'Initial setup'")
-    create_marker(marker)
-    print("✓ work/ git initialized")
+    create_marker(marker, {"git": True})
+    say("✓ work/ git initialized")
 
 
 def setup_mit_content(repair_mode):
@@ -240,17 +528,18 @@ def setup_mit_content(repair_mode):
     marker = "mit-fetched"
     psets_dir = PROJECT_DIR / "book/psets"
     code_dir = PROJECT_DIR / "book/code"
+    fingerprint = {"psets": psets_dir.exists(), "code": code_dir.exists()}
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ Problem sets and code present")
+    if marker_current(marker, fingerprint, repair_mode):
+        say("✓ Problem sets and code present")
         return
 
     if psets_dir.exists() and code_dir.exists():
-        create_marker(marker)
-        print("✓ Problem sets and code present (from git)")
+        create_marker(marker, fingerprint)
+        say("✓ Problem sets and code present (from git)")
         return
 
-    print("Fetching problem sets and code from MIT (fallback)...")
+    say("Fetching problem sets and code from MIT (fallback)...")
     (PROJECT_DIR / "book").mkdir(exist_ok=True)
 
     result = run(
@@ -270,50 +559,65 @@ def setup_mit_content(repair_mode):
             extracted_dir.mkdir(exist_ok=True)
             run(f"unzip -o -q '{allcode_zip}' -d '{extracted_dir}/'")
 
-        create_marker(marker)
-        print("✓ Problem sets and code fetched")
+        create_marker(marker, {"psets": psets_dir.exists(), "code": code_dir.exists()})
+        say("✓ Problem sets and code fetched")
     else:
-        print("⚠ MIT fetch timed out (problem sets unavailable, not critical)")
+        say("⚠ MIT fetch timed out (problem sets unavailable, not critical)")
+
+
+def load_local_settings():
+    """Load .claude/settings.local.json, or {} if there is none."""
+    local_settings_path = PROJECT_DIR / ".claude/settings.local.json"
+    if not local_settings_path.exists():
+        return {}
+    with open(local_settings_path, 'r') as f:
+        return json.load(f)
+
+
+def docs_fingerprint(docs_path):
+    """Fingerprint the docs permission: the racket binary, and docs_path while it's still granted."""
+    granted_dirs = load_local_settings().get('permissions', {}).get('additionalDirectories', [])
+    granted = docs_path is not None and Path(docs_path).is_dir() and docs_path in granted_dirs
+    return {
+        "racket": toolchain()["tools"]["racket"],
+        "docs": docs_path if granted else None,
+    }
 
 
 def setup_local_docs_permission(repair_mode):
-    """Configure local Racket docs permission in settings.local.json."""
+    """Configure local Racket docs permission in settings.local.json.
+
+    The marker records the docs path that was granted, so a routine run
+    only checks that it is still there without asking racket again.
+    """
     marker = "docs-permission"
+    record = read_marker(marker) or {}
+    docs_path = (record.get("fingerprint") or {}).get("docs")
 
-    if marker_exists(marker) and not repair_mode:
-        print("✓ Local docs permission configured")
+    if marker_current(marker, docs_fingerprint(docs_path), repair_mode):
+        say("✓ Local docs permission configured")
         return
 
     # Get Racket docs path
-    result = run(
-        "racket -e '(require setup/dirs) (displayln (path->string (find-doc-dir)))'",
-        check=False,
-        capture=True
-    )
-
-    if result.returncode != 0 or not result.stdout.strip():
-        print("⚠ Could not detect Racket docs path (local docs unavailable)")
+    docs_path = (toolchain()["racket"] or {}).get("docs_dir")
+    if not docs_path:
+        say("⚠ Could not detect Racket docs path (local docs unavailable)")
         return
 
-    docs_path = result.stdout.strip()
     if not Path(docs_path).is_dir():
-        print("⚠ Could not detect Racket docs path (local docs unavailable)")
+        say("⚠ Could not detect Racket docs path (local docs unavailable)")
         return
 
     local_settings_path = PROJECT_DIR / ".claude/settings.local.json"
 
     # Load existing settings or create empty structure
-    if local_settings_path.exists():
-        with open(local_settings_path, 'r') as f:
-            settings = json.load(f)
-    else:
-        settings = {}
+    settings = load_local_settings()
 
     # Check if already configured
     existing_dirs = settings.get('permissions', {}).get('additionalDirectories', [])
     if docs_path in existing_dirs:
-        create_marker(marker)
-        print("✓ Local docs permission already configured")
+        create_marker(marker, docs_fingerprint(docs_path))
+        say("✓ Local docs permission already configured")
         return
 
     # Ensure permissions structure exists
@@ -344,9 +648,74 @@ def setup_local_docs_permission(repair_mode):
         json.dump(settings, f, indent=2)
         f.write('\n')
 
-    create_marker(marker)
-    print("✓ Local docs permission configured")
-    print("  ↳ Restart Claude Code session for local docs access to take effect")
+    create_marker(marker, docs_fingerprint(docs_path))
+    say("✓ Local docs permission configured")
+    say("  ↳ Restart Claude Code session for local docs access to take effect")
+
+
+# Setup phases in the order their progress is reported, each with the
+# phases it needs finished first (always listed before it). Racket phases
+# run one at a time, since raco changes the installation racket reads.
+PHASES = {
+    "racket-sicp": (setup_racket_sicp, ()),
+    "submodule": (setup_submodule, ()),
+    "book-processing": (setup_book_processing, ("submodule",)),
+    "tutor-workspace": (setup_tutor_workspace, ()),
+    "work-workspace": (setup_work_workspace, ()),
+    "mit-content": (setup_mit_content, ()),
+    "docs-permission": (setup_local_docs_permission, ("racket-sicp",)),
+    "book-index": (setup_book_index, ("book-processing", "mit-content")),
+}
+
+
+def run_phase(name, phase, repair_mode, progress):
+    """Run one setup phase on a worker thread.
+
+    Returns (error or None, wall seconds).
+    """
+    phase_output.name, phase_output.progress = name, progress
+    start = time.perf_counter()
+    error = None
+    try:
+        phase(repair_mode)
+    except Exception as e:
+        error = e
+    finally:
+        phase_output.name = phase_output.progress = None
+    seconds = time.perf_counter() - start
+    progress.finish(name, *([f"✗ {name}: {error}"] if error is not None else []))
+    return error, seconds
+
+
+def run_phases(repair_mode):
+    """Run the setup phases on a thread pool, each as soon as the phases it needs are done.
+
+    Progress is printed in PHASES order, as PhaseOutput describes. A phase
+    whose needed phase failed is skipped. Returns {name: (error, seconds)}.
+    """
+    results = {}
+    running = {}
+    waiting = dict(PHASES)
+    progress = PhaseOutput(list(PHASES))
+
+    with ThreadPoolExecutor(max_workers=len(PHASES)) as pool:
+        while True:
+            for name, (phase, needs) in list(waiting.items()):
+                if not all(need in results for need in needs):
+                    continue
+                del waiting[name]
+                failed = [need for need in needs if results[need][0] is not None]
+                if failed:
+                    results[name] = (f"skipped, as {', '.join(failed)} failed", 0.0)
+                    progress.finish(name, f"✗ {name}: {results[name][0]}")
+                else:
+                    running[pool.submit(run_phase, name, phase, repair_mode, progress)] = name
+
+            if not running:
+                return results
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
 
 
 def main():
@@ -354,19 +723,26 @@ def main():
 
     print("=== SICP Tutoring Setup ===")
     if repair_mode:
-        print("(Repair mode: re-checking all phases)")
+        print("(Repair mode: re-checking every phase not fingerprinted as up to date)")
 
     # Check dependencies first (exits if missing)
     check_dependencies()
 
     # Run all setup phases
-    setup_racket_sicp(repair_mode)
-    setup_submodule(repair_mode)
-    setup_book_processing(repair_mode)
-    setup_tutor_workspace(repair_mode)
-    setup_work_workspace(repair_mode)
-    setup_mit_content(repair_mode)
-    setup_local_docs_permission(repair_mode)
+    start = time.perf_counter()
+    results = run_phases(repair_mode)
+    elapsed = time.perf_counter() - start
+
+    print()
+    print(f"Phase times ({elapsed:.1f}s in all):")
+    for name in PHASES:
+        print(f"  {name:<18} {results[name][1]:6.1f}s")
+
+    failed = [name for name in PHASES if results[name][0] is not None]
+    if failed:
+        print()
+        print(f"Setup incomplete: {', '.join(failed)} did not finish. Re-run to retry.")
+        sys.exit(1)
 
     print()
     print("Setup complete! Open this directory in Claude Code to begin.")